@@ -0,0 +1,98 @@
+from django.utils import timezone
+
+from .models import Task, TaskAccess, SharedPlanTask, Tombstone
+
+PERMISSION_RANK = {
+    TaskAccess.PERMISSION_VIEW: 1,
+    TaskAccess.PERMISSION_EDIT: 2,
+    TaskAccess.PERMISSION_OWNER: 3,
+}
+
+
+def expected_access(task_ids):
+    """Derive the {(user_id, task_id): permission} rows the given tasks should have."""
+    expected = {}
+    for task_id, user_id in Task.objects.filter(pk__in=task_ids).values_list('pk', 'user_id'):
+        expected[(user_id, task_id)] = TaskAccess.PERMISSION_OWNER
+
+    memberships = SharedPlanTask.objects.filter(
+        task_id__in=task_ids,
+        shared_plan__sharedplanmember__isnull=False
+    ).values_list(
+        'task_id',
+        'shared_plan__sharedplanmember__user_id',
+        'shared_plan__sharedplanmember__permission'
+    )
+    for task_id, user_id, permission in memberships:
+        key = (user_id, task_id)
+        current = expected.get(key)
+        if current is None or PERMISSION_RANK[permission] > PERMISSION_RANK[current]:
+            expected[key] = permission
+    return expected
+
+
+def diff_task_access(task_ids, user_ids=None):
+    """
+    Compare stored access rows for the given tasks (optionally limited to some
+    users) with the derived ones. Returns (to_create, to_update, to_delete).
+    """
+    expected = expected_access(task_ids)
+    existing = TaskAccess.objects.filter(task_id__in=task_ids)
+    if user_ids is not None:
+        user_ids = set(user_ids)
+        expected = {key: value for key, value in expected.items() if key[0] in user_ids}
+        existing = existing.filter(user_id__in=user_ids)
+
+    to_update, to_delete = [], []
+    now = timezone.now()
+    for row in existing:
+        permission = expected.pop((row.user_id, row.task_id), None)
+        if permission is None:
+            to_delete.append(row.pk)
+        elif permission != row.permission:
+            row.permission = permission
+            row.updated_at = now
+            to_update.append(row)
+
+    to_create = [
+        TaskAccess(user_id=user_id, task_id=task_id, permission=permission)
+        for (user_id, task_id), permission in expected.items()
+    ]
+    return to_create, to_update, to_delete
+
+
+def sync_task_access(task_ids, user_ids=None):
+    """Bring the access rows of the given tasks (and users) in line with the source tables."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0, 0, 0
+
+    to_create, to_update, to_delete = diff_task_access(task_ids, user_ids)
+    if to_delete:
+        TaskAccess.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        TaskAccess.objects.bulk_update(to_update, ['permission', 'updated_at'])
+    if to_create:
+        TaskAccess.objects.bulk_create(to_create, ignore_conflicts=True)
+    return len(to_create), len(to_update), len(to_delete)
+
+
+def rebuild_task_access(task_ids):
+    """
+    Replace the access rows of the given tasks with freshly derived ones.
+    The old rows are deleted without signals, so only the users who really
+    lost access get a tombstone. Returns (rows created, rows revoked).
+    """
+    task_ids = list(task_ids)
+    expected = expected_access(task_ids)
+    existing = TaskAccess.objects.filter(task_id__in=task_ids)
+    revoked = set(existing.values_list('user_id', 'task_id')) - expected.keys()
+    existing._raw_delete(existing.db)
+    TaskAccess.objects.bulk_create(
+        TaskAccess(user_id=user_id, task_id=task_id, permission=permission)
+        for (user_id, task_id), permission in expected.items()
+    )
+    Tombstone.objects.bulk_create(
+        Tombstone(user_id=user_id, kind='task', object_id=task_id) for user_id, task_id in revoked
+    )
+    return len(expected), len(revoked)
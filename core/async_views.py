@@ -0,0 +1,334 @@
+"""
+Native async versions of the hot read endpoints and the auth views.
+
+Under ASGI these serve requests on the event loop with Django's async ORM
+instead of holding a worker thread for every database round trip. They are
+routed in place of the DRF views when settings.ASYNC_API_VIEWS is on; any
+method they do not implement natively is handed to the regular DRF view.
+"""
+import json
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import views
+from .authentication import auser_status, check_user_status, lazy_user_status
+from .cache import user_row_cache
+from .conditional import make_etag
+from .hashers import PasswordHashingBusy
+from .models import Task, Streak, Category, TaskAccess, LazyUser
+from .pagination import StreakPagination
+from .routers import ais_pinned, replica_reads
+from .serializers import TaskSerializer, StreakSerializer, get_requested_fields, load_subtask_index
+from .tokens import CachedRefreshToken
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def get_token_user(request):
+    """Resolve the access token from the cookie or Authorization header into a LazyUser."""
+    raw_token = request.COOKIES.get(settings.SIMPLE_JWT['AUTH_COOKIE'])
+    if not raw_token:
+        parts = request.headers.get('Authorization', '').split()
+        if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+            raw_token = parts[1]
+    if not raw_token:
+        return None
+    try:
+        token = AccessToken(raw_token)
+        return LazyUser.for_id(token[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError):
+        return None
+
+
+async def aload_user(user):
+    """Fill in a LazyUser's deferred columns with the async ORM; inactive users fail."""
+    if user.get_deferred_fields():
+        user = await LazyUser.objects.aget(pk=user.pk)
+        user_row_cache.set(user.pk, {
+            field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields
+        })
+    if not user.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def async_endpoint(fallback=None):
+    """
+    Authenticate an async GET endpoint. Other methods go to ``fallback``, the
+    regular DRF view for the same URL, so writes keep their existing behaviour.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                if fallback is None:
+                    return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                return await sync_to_async(fallback)(request, *args, **kwargs)
+
+            try:
+                user = get_token_user(request)
+                if user is None:
+                    return json_response(
+                        {'detail': 'Authentication credentials were not provided.'},
+                        status=401
+                    )
+                # The same per-request check as CookieJWTAuthentication.get_user.
+                check_user_status(lazy_user_status(user) or await auser_status(user.pk))
+                return await view_func(request, user, *args, **kwargs)
+            except APIException as e:
+                # Mirror DRF's exception handler for bad query parameters and cursors.
+                data = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+                return json_response(data, status=e.status_code)
+        # The DRF fallback does its own CSRF checks, exactly as when routed directly.
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+async def use_replica(user):
+    return bool(settings.DATABASE_REPLICAS) and not await ais_pinned(user.pk)
+
+
+async def atask_etag(request, user):
+    access = await TaskAccess.objects.filter(user=user).aaggregate(
+        count=Count('pk'),
+        granted=Max('updated_at'),
+        updated=Max('task__updated_at')
+    )
+    categories = await Category.objects.filter(user=user).aaggregate(updated=Max('updated_at'))
+    return make_etag(
+        request.get_full_path(), access['count'], access['granted'], access['updated'],
+        categories['updated']
+    )
+
+
+@async_endpoint(fallback=views.TaskViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def task_list(request, user):
+    with replica_reads(await use_replica(user)):
+        return await _task_list(request, user)
+
+
+async def _task_list(request, user):
+    etag = await atask_etag(request, user)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    view = task_view(request, user, 'list')
+    # The viewset's own filter_queryset applies the filters, the ordering and
+    # the ?fields= pruning of columns and eager loading.
+    queryset = view.filter_queryset(Task.objects.visible_to(user))
+    page = await view.paginator.apaginate_queryset(queryset, view.request, view)
+
+    data = TaskSerializer(page, many=True, context=await task_context(view, page)).data
+    response = json_response(view.paginator.get_paginated_response(data).data)
+    response['ETag'] = etag
+    return response
+
+
+@async_endpoint(fallback=views.TaskViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+}))
+async def task_detail(request, user, pk):
+    view = task_view(request, user, 'retrieve')
+    # The same ETag as the DRF retrieve, so clients can revalidate against either.
+    etag = await sync_to_async(view.get_object_etag)(view.request, pk)
+    if etag is not None:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+    try:
+        task = await view.filter_queryset(Task.objects.visible_to(user)).aget(pk=pk)
+    except Task.DoesNotExist:
+        return json_response({'detail': 'Not found.'}, status=404)
+
+    response = json_response(TaskSerializer(task, context=await task_context(view, [task])).data)
+    if etag is not None:
+        response['ETag'] = etag
+    return response
+
+
+def task_view(request, user, action):
+    """A TaskViewSet instance for its filtering, pagination and ETag logic."""
+    drf_request = Request(request)
+    drf_request.user = user
+    view = views.TaskViewSet(request=drf_request, format_kwarg=None, kwargs={}, action=action)
+    return view
+
+
+async def task_context(view, tasks):
+    """Serializer context, with the subtask index loaded up front when subtasks are rendered."""
+    context = {'request': view.request}
+    requested = get_requested_fields(view.request)
+    if requested is None or 'subtasks' in requested:
+        context['subtask_index'] = await sync_to_async(load_subtask_index)(tasks)
+    return context
+
+
+@async_endpoint(fallback=views.StreakViewSet.as_view({'get': 'list'}))
+async def streak_list(request, user):
+    with replica_reads(await use_replica(user)):
+        return await _streak_list(request, user)
+
+
+async def _streak_list(request, user):
+    drf_request = Request(request)
+    paginator = StreakPagination()
+    page = await paginator.apaginate_queryset(Streak.objects.filter(user=user), drf_request)
+    data = StreakSerializer(page, many=True, context={'request': drf_request}).data
+    return json_response(paginator.get_paginated_response(data).data)
+
+
+@async_endpoint(fallback=views.get_current_user)
+async def current_user(request, user):
+    try:
+        user = await aload_user(user)
+    except LazyUser.DoesNotExist:
+        return json_response({'detail': 'User no longer exists.'}, status=403)
+    data = {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'date_joined': user.date_joined,
+        'last_login': user.last_login
+    }
+    etag = make_etag(*data.values())
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response = json_response(data)
+    response['ETag'] = etag
+    return response
+
+
+def read_payload(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+def set_token_cookies(response, refresh):
+    """Set the access and refresh cookies the same way the sync auth views do"""
+    for name, value, lifetime in (
+        ('access_token', refresh.access_token, settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']),
+        ('refresh_token', refresh, settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']),
+    ):
+        response.set_cookie(
+            name,
+            str(value),
+            expires=datetime.now() + lifetime,
+            secure=settings.SIMPLE_JWT['AUTH_COOKIE_SECURE'],
+            httponly=settings.SIMPLE_JWT['AUTH_COOKIE_HTTP_ONLY'],
+            samesite=settings.SIMPLE_JWT['AUTH_COOKIE_SAMESITE'],
+            path=settings.SIMPLE_JWT['AUTH_COOKIE_PATH'],
+            domain=None  # Allow cookies to work on localhost
+        )
+
+
+@csrf_exempt
+@ensure_csrf_cookie
+async def login_view(request):
+    if request.method != 'POST':
+        return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    payload = read_payload(request)
+    username = payload.get('username')
+    password = payload.get('password')
+
+    if not username or not password:
+        return json_response({'detail': 'Please provide both username and password.'}, status=400)
+
+    try:
+        user = await aauthenticate(username=username, password=password)
+    except PasswordHashingBusy as e:
+        response = json_response({'detail': e.detail}, status=e.status_code)
+        response['Retry-After'] = str(e.wait)
+        return response
+    if user is None:
+        return json_response({'detail': 'Invalid credentials.'}, status=400)
+
+    refresh = await sync_to_async(CachedRefreshToken.for_user)(user)
+    response = json_response({
+        'detail': 'Successfully logged in.',
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name
+        }
+    })
+    set_token_cookies(response, refresh)
+    response.set_cookie(
+        'csrftoken',
+        request.META.get('CSRF_COOKIE', ''),
+        secure=settings.SIMPLE_JWT['AUTH_COOKIE_SECURE'],
+        httponly=False,  # CSRF token needs to be accessible by JavaScript
+        samesite=settings.SIMPLE_JWT['AUTH_COOKIE_SAMESITE'],
+        path=settings.SIMPLE_JWT['AUTH_COOKIE_PATH'],
+        domain=None  # Allow cookies to work on localhost
+    )
+    return response
+
+
+@csrf_exempt
+@ensure_csrf_cookie
+async def refresh_token_view(request):
+    if request.method != 'POST':
+        return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    refresh_token = request.COOKIES.get('refresh_token')
+    if not refresh_token:
+        return json_response({'detail': 'No refresh token found.'}, status=400)
+
+    try:
+        # Verification may read the blacklist tables on a cache miss.
+        token = await sync_to_async(CachedRefreshToken)(refresh_token)
+    except TokenError:
+        return json_response({'detail': 'Invalid refresh token.'}, status=401)
+
+    response = json_response({'detail': 'Token refreshed successfully.'})
+    set_token_cookies(response, token)
+    return response
+
+
+@csrf_exempt
+@ensure_csrf_cookie
+async def logout_view(request):
+    if request.method != 'POST':
+        return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    refresh_token = request.COOKIES.get('refresh_token')
+    if not refresh_token:
+        return json_response({'detail': 'No refresh token found.'})
+
+    try:
+        token = await sync_to_async(CachedRefreshToken)(refresh_token)
+        await sync_to_async(token.blacklist)()
+    except TokenError:
+        return json_response({'detail': 'Error during logout.'}, status=400)
+
+    response = json_response({'detail': 'Successfully logged out.'})
+    views.unset_auth_cookies(response)
+    return response
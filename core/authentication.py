@@ -1,8 +1,55 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.conf import settings
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import AccessToken
 
+from .models import LazyUser
+
+USER_STATUS_KEY = 'user-status:{pk}'
+ACTIVE, INACTIVE, MISSING = 'active', 'inactive', 'missing'
+
+
+def user_status(user_id):
+    """
+    Whether the user exists and is active, from a flag cached for
+    JWT_USER_STATUS_TTL seconds that saving or deleting the user clears.
+    """
+    key = USER_STATUS_KEY.format(pk=user_id)
+    status = cache.get(key)
+    if status is None:
+        row = LazyUser.objects.filter(pk=user_id).values_list('is_active', flat=True).first()
+        status = MISSING if row is None else ACTIVE if row else INACTIVE
+        cache.set(key, status, settings.JWT_USER_STATUS_TTL)
+    return status
+
+
+async def auser_status(user_id):
+    key = USER_STATUS_KEY.format(pk=user_id)
+    status = await cache.aget(key)
+    if status is None:
+        row = await LazyUser.objects.filter(pk=user_id).values_list('is_active', flat=True).afirst()
+        status = MISSING if row is None else ACTIVE if row else INACTIVE
+        await cache.aset(key, status, settings.JWT_USER_STATUS_TTL)
+    return status
+
+
+def check_user_status(status):
+    if status == MISSING:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if status == INACTIVE:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+
+def lazy_user_status(user):
+    """The status of a LazyUser from its row when that is loaded, else None."""
+    if 'is_active' in user.get_deferred_fields():
+        return None
+    return ACTIVE if user.is_active else INACTIVE
+
+
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         # Try to get the token from the cookie first
@@ -17,4 +64,24 @@ class CookieJWTAuthentication(JWTAuthentication):
                 return None
         
         # If no token in cookie, try the Authorization header
-        return super().authenticate(request) 
\ No newline at end of file
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        """
+        With JWT_LAZY_USER on, return a LazyUser built from the token's user id
+        claim instead of reading the User row on every request.
+        """
+        if not settings.JWT_LAZY_USER:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = LazyUser.for_id(user_id)
+        # Checked on every request, from the cached row or the cached status
+        # flag, so deactivated and deleted users are turned away even by
+        # views that never read the row.
+        check_user_status(lazy_user_status(user) or user_status(user_id))
+        return user
@@ -0,0 +1,114 @@
+"""
+Badge awarding.
+
+A badge's ``code`` names its rule as ``<rule>_<threshold>``, e.g.
+``tasks_completed_10`` or ``streak_7``. Each rule reads one of the
+StreakSummary counters, so awarding never re-aggregates a user's history.
+Badges whose code is not a rule are left for manual awarding.
+"""
+import re
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .cache import cache_scope, get_version, invalidate
+from .models import Badge, UserBadge, StreakSummary
+
+RULE_METRICS = {
+    'tasks_completed': 'total_tasks_completed',
+    'streak': 'longest_streak',
+    'active_days': 'total_active_days',
+}
+RULE_PATTERN = re.compile(r'^(?P<rule>[a-z_]+?)_(?P<threshold>\d+)$')
+RULES_KEY = 'badge-rules:{version}'
+
+BadgeRule = namedtuple('BadgeRule', ['badge_id', 'metric', 'threshold'])
+
+
+def parse_rule(badge_id, code):
+    match = RULE_PATTERN.match(code)
+    if match is None or match['rule'] not in RULE_METRICS:
+        return None
+    return BadgeRule(badge_id, RULE_METRICS[match['rule']], int(match['threshold']))
+
+
+def get_rules():
+    """The rules of every badge, cached until a Badge is saved or deleted."""
+    key = RULES_KEY.format(version=get_version(cache_scope(Badge)))
+    rules = cache.get(key)
+    if rules is None:
+        rules = [
+            rule for rule in (
+                parse_rule(badge_id, code)
+                for badge_id, code in Badge.objects.values_list('pk', 'code')
+            )
+            if rule is not None
+        ]
+        cache.set(key, rules, None)
+    return rules
+
+
+def award_for_change(user, before, after):
+    """
+    Award the badges whose threshold was crossed going from the ``before`` to
+    the ``after`` metrics. Badges the user already qualified for were awarded
+    by an earlier event (or by evaluate_all), so most events run no query.
+    """
+    badge_ids = [
+        rule.badge_id for rule in get_rules()
+        if before[rule.metric] < rule.threshold <= after[rule.metric]
+    ]
+    if badge_ids:
+        UserBadge.objects.bulk_create(
+            [UserBadge(user_id=user.pk, badge_id=badge_id) for badge_id in badge_ids],
+            ignore_conflicts=True
+        )
+        # bulk_create sends no post_save, so drop the cached badge lists here.
+        invalidate(UserBadge, user.pk)
+    return badge_ids
+
+
+def evaluate_all(chunk_size=1000, user_ids=None):
+    """
+    Award every badge each user qualifies for, a chunk of users at a time.
+    Run it after adding badges or rebuilding the streak summaries. Returns
+    the number of badges awarded.
+    """
+    rules = get_rules()
+    if not rules:
+        return 0
+
+    summaries = StreakSummary.objects.order_by('user_id')
+    if user_ids is not None:
+        summaries = summaries.filter(user_id__in=user_ids)
+    # Only users who meet the lowest threshold of some rule can earn anything.
+    qualifies = Q()
+    for rule in rules:
+        qualifies |= Q(**{f'{rule.metric}__gte': rule.threshold})
+    summaries = summaries.filter(qualifies).values_list('user_id', *StreakSummary.METRICS)
+
+    awarded = 0
+    last_user_id = 0
+    while True:
+        chunk = list(summaries.filter(user_id__gt=last_user_id)[:chunk_size])
+        if not chunk:
+            break
+        last_user_id = chunk[-1][0]
+
+        held = set(
+            UserBadge.objects.filter(user_id__in=[row[0] for row in chunk])
+            .values_list('user_id', 'badge_id')
+        )
+        new_badges = []
+        for user_id, *values in chunk:
+            metrics = dict(zip(StreakSummary.METRICS, values))
+            new_badges.extend(
+                UserBadge(user_id=user_id, badge_id=rule.badge_id) for rule in rules
+                if metrics[rule.metric] >= rule.threshold and (user_id, rule.badge_id) not in held
+            )
+        UserBadge.objects.bulk_create(new_badges, ignore_conflicts=True)
+        for user_id in {badge.user_id for badge in new_badges}:
+            invalidate(UserBadge, user_id)
+        awarded += len(new_badges)
+    return awarded
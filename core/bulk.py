@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task, TaskCategory, TaskAccess, Category
+from .serializers import TaskSerializer
+from .snapshots import refresh_category_snapshots
+
+
+class BulkOperationError(Exception):
+    """Raised with one error dict per operation (empty for the valid ones)."""
+
+    def __init__(self, errors):
+        super().__init__('Bulk task operations failed validation.')
+        self.errors = errors
+
+
+def apply_task_operations(user, operations):
+    """
+    Validate and apply a batch of create/update/delete operations on tasks.
+
+    Nothing is written unless every operation is valid. All writes happen in
+    one transaction using bulk_create/bulk_update, and the result list lines
+    up with the input operations.
+    """
+    errors = [{} for _ in operations]
+    creates = [(i, op) for i, op in enumerate(operations) if op['op'] == 'create']
+    updates = [(i, op) for i, op in enumerate(operations) if op['op'] == 'update']
+    deletes = [(i, op) for i, op in enumerate(operations) if op['op'] == 'delete']
+
+    seen = {}
+    for i, op in updates + deletes:
+        if op['id'] in seen:
+            errors[i]['id'] = [f"Task {op['id']} already appears in operation {seen[op['id']]}."]
+        seen[op['id']] = i
+
+    editable = Task.objects.editable_by(user).in_bulk([op['id'] for _, op in updates + deletes])
+    for i, op in updates + deletes:
+        if op['id'] not in editable:
+            errors[i].setdefault('id', ['Not found.'])
+
+    create_data = _validate(errors, creates, partial=False)
+    update_data = _validate(errors, updates, partial=True)
+
+    category_ids = {pk for _, op in creates + updates for pk in op.get('categories', ())}
+    owned_categories = set(
+        Category.objects.filter(user=user, pk__in=category_ids).values_list('pk', flat=True)
+    )
+    for i, op in creates + updates:
+        missing = [pk for pk in op.get('categories', ()) if pk not in owned_categories]
+        if missing:
+            errors[i]['categories'] = [f'Unknown categories: {missing}']
+
+    if any(errors):
+        raise BulkOperationError(errors)
+
+    results = [None] * len(operations)
+    with transaction.atomic():
+        new_tasks = Task.objects.bulk_create(
+            Task(user=user, **validated) for validated in create_data
+        )
+        TaskAccess.objects.bulk_create(
+            (TaskAccess(user=user, task=task, permission=TaskAccess.PERMISSION_OWNER)
+             for task in new_tasks),
+            ignore_conflicts=True
+        )
+        for (i, op), task in zip(creates, new_tasks):
+            results[i] = {'op': 'create', 'id': task.pk, 'status': 'created'}
+
+        changed_tasks, changed_fields = [], {'updated_at'}
+        now = timezone.now()
+        for (i, op), validated in zip(updates, update_data):
+            task = editable[op['id']]
+            for field, value in validated.items():
+                setattr(task, field, value)
+            task.updated_at = now
+            changed_fields.update(validated)
+            changed_tasks.append(task)
+            results[i] = {'op': 'update', 'id': task.pk, 'status': 'updated'}
+        if changed_tasks:
+            Task.objects.bulk_update(changed_tasks, sorted(changed_fields))
+
+        if deletes:
+            Task.objects.filter(pk__in=[op['id'] for _, op in deletes]).delete()
+            for i, op in deletes:
+                results[i] = {'op': 'delete', 'id': op['id'], 'status': 'deleted'}
+
+        links = {task.pk: op['categories'] for (_, op), task in zip(creates, new_tasks) if 'categories' in op}
+        links.update({op['id']: op['categories'] for _, op in updates if 'categories' in op})
+        _replace_category_links(user, links)
+
+    return results
+
+
+def _validate(errors, indexed_operations, partial):
+    serializer = TaskSerializer(
+        data=[op.get('data', {}) for _, op in indexed_operations],
+        many=True,
+        partial=partial
+    )
+    if serializer.is_valid():
+        return serializer.validated_data
+    for (i, _), item_errors in zip(indexed_operations, serializer.errors):
+        errors[i].update(item_errors)
+    return []
+
+
+def _replace_category_links(user, links):
+    """
+    Make the user's categories on each task match {task_id: [category_id, ...]}
+    exactly. Links to other users' categories (the owner's, on a shared task
+    the user may edit) are left alone.
+    """
+    if not links:
+        return
+    existing = set(
+        TaskCategory.objects.filter(task_id__in=links, category__user=user).values_list('task_id', 'category_id')
+    )
+    wanted = {(task_id, category_id) for task_id, ids in links.items() for category_id in ids}
+
+    stale = existing - wanted
+    if stale:
+        stale_ids = [
+            pk for pk, task_id, category_id in TaskCategory.objects.filter(
+                task_id__in={task_id for task_id, _ in stale}
+            ).values_list('pk', 'task_id', 'category_id')
+            if (task_id, category_id) in stale
+        ]
+        TaskCategory.objects.filter(pk__in=stale_ids).delete()
+
+    TaskCategory.objects.bulk_create(
+        (TaskCategory(task_id=task_id, category_id=category_id)
+         for task_id, category_id in wanted - existing),
+        ignore_conflicts=True
+    )
+    # bulk_create sends no signals, so refresh the snapshots in one pass.
+    refresh_category_snapshots(links)
@@ -0,0 +1,143 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .routers import pin_primary
+
+VERSION_KEY = 'api-cache-version:{scope}'
+RESPONSE_KEY = 'api-cache:{view}:{versions}:{user}:{path}'
+
+
+def is_shared_cache(alias='default'):
+    """Whether every worker process sees the same entries in this cache."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def cache_scope(model, user_id=None):
+    """Models owned by a user are versioned per user; everything else globally."""
+    label = model._meta.label_lower
+    if user_id is not None and any(field.name == 'user' for field in model._meta.fields):
+        return f'{label}:{user_id}'
+    return label
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        # A random stamp (rather than a counter) cannot collide with the stamp
+        # of entries written before the version key was evicted.
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate(model, user_id=None):
+    """
+    Orphan every cached response that depends on the model (for this user)
+    once the current transaction commits. Bumping earlier would let a
+    concurrent read cache the old rows under the new version.
+    """
+    scope = cache_scope(model, user_id)
+
+    def bump():
+        cache.set(VERSION_KEY.format(scope=scope), uuid.uuid4().hex, None)
+        # The entry rebuilt next must not come from a replica that lags the write.
+        pin_primary(user_id if scope != cache_scope(model) else None)
+
+    transaction.on_commit(bump)
+
+
+class CachedResponseMixin:
+    """
+    Serve list/retrieve responses from the Django cache. Entries are keyed by
+    view, user and full path, and stamped with the current version of every
+    model in ``cache_models``; saving or deleting one of those rows bumps the
+    version (see core.signals), which orphans the stale entries.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        return response
+
+    def get_response_cache_key(self, request):
+        user_id = request.user.pk
+        versions = '.'.join(get_version(cache_scope(model, user_id)) for model in self.cache_models)
+        return RESPONSE_KEY.format(
+            view=self.__class__.__name__,
+            versions=hashlib.md5(versions.encode()).hexdigest(),
+            user=user_id,
+            path=hashlib.md5(request.get_full_path().encode()).hexdigest(),
+        )
+
+
+class LocalTTLCache:
+    """
+    Small thread-safe, in-process LRU whose entries expire after ``ttl``
+    seconds. A ``ttl`` of 0 disables it.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if not self.ttl:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.ttl:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# User rows read by LazyUser, shared by every request in this process.
+user_row_cache = LocalTTLCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
@@ -0,0 +1,376 @@
+"""
+Calendar sync engine.
+
+Each CalendarSync account is synced by its provider (a CalendarProvider
+subclass named in settings.CALENDAR_SYNC_PROVIDERS). Providers return their
+changes a page at a time along with a sync token, so after the first full
+sync only what changed since ``sync_token`` is fetched. Every page is
+upserted in one transaction with bulk writes. A full sync lists every item,
+so afterwards the tasks of items it did not list are deleted.
+
+run_syncs() syncs many accounts at once on a bounded thread pool; each
+provider's calls share a rate limiter and are retried with exponential
+backoff when the provider reports a transient failure.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+from .models import CalendarSync, CalendarSyncTask, Task, TaskAccess
+from .routers import pin_primary
+from .serializers import TaskSerializer
+
+# Long enough to cover a slow sync; a crashed runner's lock expires with it.
+LOCK_DURATION = timedelta(minutes=30)
+# Tasks deleted per query when a full sync removes what the provider no longer lists.
+RECONCILE_CHUNK_SIZE = 1000
+
+
+class ProviderError(Exception):
+    """A sync failed; the message is stored on the account as ``last_error``."""
+
+
+class RetryableProviderError(ProviderError):
+    """A transient failure (rate limited, timeout, 5xx) worth retrying."""
+
+    def __init__(self, message='', retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SyncTokenExpired(ProviderError):
+    """The provider no longer accepts the sync token; a full sync is needed."""
+
+
+class SyncPage(NamedTuple):
+    """
+    One page of changes. ``items`` are dicts of task fields plus the
+    provider's ``external_id``; ``deleted`` lists external ids. The last page
+    has no ``next_page_token`` and carries the ``sync_token`` for next time.
+    """
+    items: list
+    deleted: list
+    next_page_token: Optional[str] = None
+    sync_token: Optional[str] = None
+
+
+class CalendarProvider:
+    """Base class for providers. ``rate_limit`` is in calls per second (None for no limit)."""
+    rate_limit = None
+
+    def fetch_page(self, account, sync_token, page_token):
+        """
+        Return the SyncPage after ``page_token`` of the changes since
+        ``sync_token`` (everything when it is None). Raise
+        RetryableProviderError for transient failures and SyncTokenExpired
+        when the token is no longer valid.
+        """
+        raise NotImplementedError
+
+
+class FakeCalendar:
+    """An in-memory calendar whose changes are numbered, like a provider's change log."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.changes = {}  # external_id -> (version, fields, or None once deleted)
+        self.failures = []
+
+    def put(self, external_id, **fields):
+        with self.lock:
+            self.version += 1
+            self.changes[external_id] = (self.version, fields)
+
+    def delete(self, external_id):
+        with self.lock:
+            self.version += 1
+            self.changes[external_id] = (self.version, None)
+
+    def fail(self, *errors):
+        """Raise these errors from the next fetches, one per call."""
+        with self.lock:
+            self.failures.extend(errors)
+
+
+class FakeCalendarProvider(CalendarProvider):
+    """
+    A local provider for tests; it is not registered in production settings.
+    Calendars live in memory, keyed by the account's ``provider_user_id``;
+    the sync token is the calendar's change version.
+    """
+    calendars = {}
+    page_size = 100
+
+    @classmethod
+    def calendar(cls, provider_user_id):
+        return cls.calendars.setdefault(provider_user_id, FakeCalendar())
+
+    def fetch_page(self, account, sync_token, page_token):
+        calendar = self.calendar(account.provider_user_id)
+        with calendar.lock:
+            if calendar.failures:
+                raise calendar.failures.pop(0)
+            # The page token pins the version the listing started at, so
+            # changes made while paging wait for the next sync.
+            upto, offset = map(int, page_token.split(':')) if page_token else (calendar.version, 0)
+            since = int(sync_token or 0)
+            if since > calendar.version:
+                raise SyncTokenExpired('Unknown sync token.')
+            changes = sorted(
+                (version, external_id, fields)
+                for external_id, (version, fields) in calendar.changes.items()
+                if since < version <= upto
+            )
+
+        page = changes[offset:offset + self.page_size]
+        more = offset + self.page_size < len(changes)
+        return SyncPage(
+            items=[dict(fields, external_id=external_id) for _, external_id, fields in page if fields is not None],
+            deleted=[external_id for _, external_id, fields in page if fields is None],
+            next_page_token=f'{upto}:{offset + self.page_size}' if more else None,
+            sync_token=None if more else str(upto),
+        )
+
+
+class RateLimiter:
+    """A token bucket shared by every thread calling one provider."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        # Allow a burst of up to a second's worth of calls, and at least one.
+        self.capacity = max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_providers = {}
+_rate_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_provider(name):
+    """The provider instance and its rate limiter (or None) for a provider name."""
+    path = settings.CALENDAR_SYNC_PROVIDERS.get(name)
+    if path is None:
+        raise ProviderError(f'Unknown calendar provider "{name}".')
+    with _registry_lock:
+        if path not in _providers:
+            provider = import_string(path)()
+            _providers[path] = provider
+            _rate_limiters[path] = RateLimiter(provider.rate_limit) if provider.rate_limit else None
+        return _providers[path], _rate_limiters[path]
+
+
+def call_with_retries(func, *args, retries=None, backoff=None):
+    """Call ``func``, retrying RetryableProviderError with exponential backoff and jitter."""
+    retries = settings.CALENDAR_SYNC_MAX_RETRIES if retries is None else retries
+    backoff = settings.CALENDAR_SYNC_BACKOFF if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except RetryableProviderError as e:
+            if attempt == retries:
+                raise
+            delay = e.retry_after if e.retry_after is not None else backoff * 2 ** attempt
+            time.sleep(delay * random.uniform(1, 1.5))
+
+
+def lock_account(account):
+    """
+    Take the account's sync lock, unless another sync (in any process) holds
+    it. The lock is a lease on the row, claimed by one conditional UPDATE,
+    rather than a row lock held for the whole sync: that would put every
+    page in one long transaction.
+    """
+    now = timezone.now()
+    return bool(
+        CalendarSync.objects.filter(pk=account.pk)
+        .filter(models.Q(locked_until__isnull=True) | models.Q(locked_until__lt=now))
+        .update(locked_until=now + LOCK_DURATION)
+    )
+
+
+def sync_account(account):
+    """
+    Sync one account and return its stats. Failures are recorded in
+    ``last_error`` rather than raised. An account already being synced
+    elsewhere is skipped.
+    """
+    stats = {'account': account.pk, 'created': 0, 'updated': 0, 'deleted': 0, 'skipped': 0, 'error': None}
+    if not lock_account(account):
+        stats['error'] = 'Already syncing.'
+        return stats
+
+    try:
+        provider, rate_limiter = get_provider(account.provider)
+        # Changes made while this sync runs are picked up by the next one.
+        started = timezone.now()
+        sync_token = account.sync_token or None
+        page_token = None
+        # External ids listed by a full sync; None during an incremental one.
+        listed = None if sync_token else set()
+
+        def fetch_page(sync_token, page_token):
+            # Retries count against the rate limit too.
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            return provider.fetch_page(account, sync_token, page_token)
+
+        while True:
+            try:
+                page = call_with_retries(fetch_page, sync_token, page_token)
+            except SyncTokenExpired:
+                if sync_token is None:
+                    raise
+                sync_token = page_token = None
+                listed = set()
+                continue
+            apply_page(account, page, stats)
+            if listed is not None:
+                listed.update(str(item['external_id']) for item in page.items)
+            page_token = page.next_page_token
+            if page_token is None:
+                break
+        if listed is not None:
+            remove_unlisted(account, listed, stats)
+        CalendarSync.objects.filter(pk=account.pk).update(
+            sync_token=page.sync_token or '', synced_at=started, last_error=''
+        )
+    except Exception as e:
+        # One broken account must not stop the others in run_syncs().
+        stats['error'] = str(e) or e.__class__.__name__
+        CalendarSync.objects.filter(pk=account.pk).update(last_error=stats['error'])
+    finally:
+        CalendarSync.objects.filter(pk=account.pk).update(locked_until=None)
+    return stats
+
+
+def apply_page(account, page, stats):
+    """Upsert one page of changes into the account owner's tasks, in one transaction."""
+    serializer = TaskSerializer()
+    items = {}
+    for item in page.items:
+        fields = dict(item)
+        external_id = str(fields.pop('external_id'))
+        try:
+            items[external_id] = serializer.run_validation(fields)
+        except ValidationError:
+            stats['skipped'] += 1
+    deleted = [str(external_id) for external_id in page.deleted if str(external_id) not in items]
+
+    with transaction.atomic():
+        links = dict(
+            CalendarSyncTask.objects.filter(calendar_sync=account, external_id__in=[*items, *deleted])
+            .values_list('external_id', 'task_id')
+        )
+        doomed = [links[external_id] for external_id in deleted if external_id in links]
+        if doomed:
+            # A queryset delete, so tombstones and access rows follow via signals.
+            Task.objects.filter(pk__in=doomed).delete()
+            stats['deleted'] += len(doomed)
+
+        existing = Task.objects.in_bulk([links[external_id] for external_id in items if external_id in links])
+        changed_tasks, changed_fields = [], {'updated_at'}
+        now = timezone.now()
+        for external_id, validated in items.items():
+            task = existing.get(links.get(external_id))
+            if task is None:
+                continue
+            for field, value in validated.items():
+                setattr(task, field, value)
+            task.updated_at = now
+            changed_fields.update(validated)
+            changed_tasks.append(task)
+        if changed_tasks:
+            Task.objects.bulk_update(changed_tasks, sorted(changed_fields))
+            stats['updated'] += len(changed_tasks)
+
+        new_items = [
+            (external_id, validated) for external_id, validated in items.items()
+            if links.get(external_id) not in existing
+        ]
+        new_tasks = Task.objects.bulk_create(
+            Task(user_id=account.user_id, **validated) for _, validated in new_items
+        )
+        TaskAccess.objects.bulk_create(
+            (TaskAccess(user_id=account.user_id, task=task, permission=TaskAccess.PERMISSION_OWNER)
+             for task in new_tasks),
+            ignore_conflicts=True
+        )
+        # Links whose task was deleted locally went with it, so these are new.
+        CalendarSyncTask.objects.bulk_create(
+            CalendarSyncTask(calendar_sync=account, external_id=external_id, task=task)
+            for (external_id, _), task in zip(new_items, new_tasks)
+        )
+        stats['created'] += len(new_tasks)
+
+    if doomed or changed_tasks or new_tasks:
+        pin_primary(account.user_id)
+
+
+def remove_unlisted(account, listed, stats):
+    """
+    After a full sync, delete the account's tasks whose items the provider
+    no longer lists: deleted while the sync token was expired, their
+    deletions never reached us.
+    """
+    doomed = [
+        task_id for external_id, task_id
+        in CalendarSyncTask.objects.filter(calendar_sync=account).values_list('external_id', 'task_id')
+        if external_id not in listed
+    ]
+    for start in range(0, len(doomed), RECONCILE_CHUNK_SIZE):
+        # A queryset delete, so tombstones and access rows follow via signals.
+        Task.objects.filter(pk__in=doomed[start:start + RECONCILE_CHUNK_SIZE]).delete()
+    stats['deleted'] += len(doomed)
+    if doomed:
+        pin_primary(account.user_id)
+
+
+def _sync_in_thread(account):
+    try:
+        return sync_account(account)
+    finally:
+        # Worker threads each hold their own connection; don't leave it open.
+        connection.close()
+
+
+def run_syncs(accounts=None, max_workers=None):
+    """
+    Sync the given accounts (by default every account that is due) on at most
+    ``max_workers`` threads. Returns the stats of each account.
+    """
+    if accounts is None:
+        accounts = CalendarSync.objects.due(settings.CALENDAR_SYNC_INTERVAL).filter(
+            provider__in=settings.CALENDAR_SYNC_PROVIDERS
+        )
+    accounts = list(accounts)
+    if not accounts:
+        return []
+    max_workers = max_workers or settings.CALENDAR_SYNC_CONCURRENCY
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(accounts)),
+                            thread_name_prefix='calendar-sync') as executor:
+        return list(executor.map(_sync_in_thread, accounts))
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .cache import is_shared_cache
+
+
+@register(Tags.caches)
+def check_replica_pins_are_shared(app_configs, **kwargs):
+    """
+    Primary pins (see core.routers) must be seen by every worker process,
+    or a user's next read after a write may hit a lagging replica in another
+    process.
+    """
+    if settings.DATABASE_REPLICAS and not is_shared_cache():
+        return [Error(
+            'DATABASE_REPLICAS is set but the default cache is per process, so '
+            'replica pins written by one worker are invisible to the others.',
+            hint='Set CACHE_BACKEND to a shared cache such as Redis, or unset DATABASE_REPLICA_HOSTS.',
+            id='core.E001',
+        )]
+    return []
+
+
+@register(Tags.caches)
+def check_hashing_slots_are_shared(app_configs, **kwargs):
+    """
+    Hashing slots (see core.hashers) counted in a per-process cache bound
+    each worker separately, so PASSWORD_HASH_CONCURRENCY is multiplied by
+    the number of workers.
+    """
+    if not is_shared_cache():
+        return [Warning(
+            'The default cache is per process, so PASSWORD_HASH_CONCURRENCY '
+            'limits each worker process separately rather than the server as a whole.',
+            hint='Set CACHE_BACKEND to a shared cache such as Redis, or divide '
+                 'PASSWORD_HASH_CONCURRENCY by the number of worker processes.',
+            id='core.W001',
+        )]
+    return []
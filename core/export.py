@@ -0,0 +1,64 @@
+"""
+Full export of a user's data, streamed as one JSON object of arrays or as
+NDJSON with one ``{"type": ..., "data": ...}`` record per line.
+
+Every section is read through ``QuerySet.iterator()`` (a server-side cursor
+on PostgreSQL) and serialized a chunk at a time, so memory stays flat
+however much data the user has.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Category, Task, Streak, UserBadge
+from .serializers import CategorySerializer, SyncTaskSerializer, StreakSerializer, UserBadgeSerializer
+from .streaming import iter_chunks, stream_json_object, stream_ndjson
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets ``?format=ndjson`` through content negotiation; exports stream their own body."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=JSONEncoder) + '\n').encode()
+
+
+def export_sections(user_id):
+    """(section, record type, serializer class, queryset) for each kind of data a user owns."""
+    return (
+        ('categories', 'category', CategorySerializer,
+         Category.objects.filter(user_id=user_id).order_by('pk')),
+        ('tasks', 'task', SyncTaskSerializer,
+         Task.objects.filter(user_id=user_id).order_by('pk')),
+        ('streaks', 'streak', StreakSerializer,
+         Streak.objects.filter(user_id=user_id).order_by('date', 'pk')),
+        ('badges', 'badge', UserBadgeSerializer,
+         UserBadge.objects.filter(user_id=user_id).select_related('badge').order_by('pk')),
+    )
+
+
+def iter_serialized(serializer_class, queryset, chunk_size):
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield serializer_class(chunk, many=True).data
+
+
+def stream_export(user_id, format, chunk_size=EXPORT_CHUNK_SIZE):
+    """The export body, as an iterator of strings for a StreamingHttpResponse."""
+    sections = export_sections(user_id)
+    if format == NDJSONRenderer.format:
+        return stream_ndjson(
+            [{'type': record_type, 'data': item} for item in items]
+            for _, record_type, serializer_class, queryset in sections
+            for items in iter_serialized(serializer_class, queryset, chunk_size)
+        )
+    return stream_json_object(
+        (name, iter_serialized(serializer_class, queryset, chunk_size))
+        for name, _, serializer_class, queryset in sections
+    )
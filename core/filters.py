@@ -0,0 +1,145 @@
+import zoneinfo
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import TaskCategory
+
+SEARCH_CONFIG = 'english'
+
+
+def parse_datetime_param(value, tz):
+    """Parse an ISO 8601 datetime, or a date meaning midnight, as an aware datetime in ``tz``."""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed
+
+
+def get_request_timezone(request):
+    try:
+        return zoneinfo.ZoneInfo(request.query_params.get('tz') or settings.TIME_ZONE)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ParseError('Unknown time zone.')
+
+
+def get_search_term(request):
+    return request.query_params.get('search', '').strip()
+
+
+def _id_list(request, name):
+    raw = request.query_params.get(name)
+    if not raw:
+        return None
+    try:
+        return [int(value) for value in raw.split(',')]
+    except ValueError:
+        raise ParseError(f'{name} must be a comma-separated list of ids.')
+
+
+def _value_list(request, name):
+    raw = request.query_params.get(name)
+    return [value for value in raw.split(',') if value] if raw else None
+
+
+class TaskFilter(BaseFilterBackend):
+    """
+    Task list filters:
+
+    ``status``, ``priority``   comma-separated values
+    ``category``               comma-separated category ids (any of them)
+    ``parent``                 a task id, or ``none`` for top-level tasks
+    ``due_after``, ``due_before``  ISO 8601 datetimes or dates (in ``tz``)
+    ``search``                 full-text search over title and description
+
+    Searching annotates each task with its ``rank``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        statuses = _value_list(request, 'status')
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+
+        priorities = _value_list(request, 'priority')
+        if priorities:
+            queryset = queryset.filter(priority__in=priorities)
+
+        category_ids = _id_list(request, 'category')
+        if category_ids:
+            # A subquery rather than a join, so a task in several of the
+            # categories is still listed once.
+            queryset = queryset.filter(
+                pk__in=TaskCategory.objects.filter(category_id__in=category_ids).values('task_id')
+            )
+
+        parent = request.query_params.get('parent')
+        if parent == 'none':
+            queryset = queryset.filter(parent_task__isnull=True)
+        elif parent:
+            if not parent.isdigit():
+                raise ParseError('parent must be a task id or "none".')
+            queryset = queryset.filter(parent_task_id=int(parent))
+
+        for name, lookup in (('due_after', 'due_date__gte'), ('due_before', 'due_date__lt')):
+            value = request.query_params.get(name)
+            if value:
+                bound = parse_datetime_param(value, get_request_timezone(request))
+                if bound is None:
+                    raise ParseError(f'{name} must be an ISO 8601 date or datetime.')
+                queryset = queryset.filter(**{lookup: bound})
+
+        term = get_search_term(request)
+        if term:
+            queryset = self.search(queryset, term)
+        return queryset
+
+    def search(self, queryset, term):
+        if connection.vendor != 'postgresql':
+            # search_vector is only maintained by the PostgreSQL trigger.
+            return queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            ).annotate(rank=Value(0.0, output_field=FloatField()))
+
+        query = SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+
+
+class TaskOrderingFilter(OrderingFilter):
+    """
+    ``?ordering=`` over a few task fields. The id is always appended so the
+    keyset paginator gets a unique position; search results default to the
+    best ranked first.
+    """
+    ordering_fields = ('due_date', 'created_at', 'updated_at', 'title')
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        fields = []
+        if params:
+            fields = self.remove_invalid_fields(
+                queryset, [param.strip() for param in params.split(',')], view, request
+            )
+        if not fields:
+            if get_search_term(request):
+                return ('-rank', '-id')
+            return view.pagination_class.ordering
+        return tuple(fields) + ('-id',)
@@ -0,0 +1,167 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.exceptions import Throttled
+
+from .cache import is_shared_cache
+
+SLOTS_KEY = 'password-hashing-slots'
+WAITING_KEY = 'password-hashing-waiting'
+
+
+class PasswordHashingBusy(Throttled):
+    """
+    Raised when every hashing slot is taken and the queue for them is full,
+    or a queued hash timed out waiting. DRF
+    views answer it with a 429 and Retry-After; PasswordHashingBusyMiddleware
+    does the same for everything else (the admin login, for one).
+    """
+    default_detail = 'Too many sign-in attempts in progress. Please try again shortly.'
+
+    def __init__(self):
+        super().__init__(wait=settings.PASSWORD_HASH_RETRY_AFTER, detail=self.default_detail)
+
+
+class SharedHashingSlots:
+    """
+    PASSWORD_HASH_CONCURRENCY running hashes and PASSWORD_HASH_QUEUE_SIZE
+    waiting ones, counted in the shared cache so the bounds hold across
+    every worker process. A waiting hash polls for a free slot for up to
+    PASSWORD_HASH_QUEUE_TIMEOUT seconds.
+    """
+    poll_interval = 0.05
+
+    def acquire(self):
+        if self._take(SLOTS_KEY, settings.PASSWORD_HASH_CONCURRENCY):
+            return True
+        if not self._take(WAITING_KEY, settings.PASSWORD_HASH_QUEUE_SIZE):
+            return False
+        try:
+            deadline = time.monotonic() + settings.PASSWORD_HASH_QUEUE_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                if self._take(SLOTS_KEY, settings.PASSWORD_HASH_CONCURRENCY):
+                    return True
+            return False
+        finally:
+            self._give(WAITING_KEY)
+
+    def release(self):
+        self._give(SLOTS_KEY)
+
+    def _take(self, key, limit):
+        timeout = settings.PASSWORD_HASH_SLOT_TIMEOUT
+        cache.add(key, 0, timeout)
+        try:
+            taken = cache.incr(key)
+        except ValueError:
+            # The counter expired between add() and incr().
+            cache.add(key, 0, timeout)
+            taken = cache.incr(key)
+        # Slots leaked by a killed worker are forgotten once the counter has
+        # been idle for the timeout; touching on every take keeps a busy one.
+        cache.touch(key, timeout)
+        if taken > limit:
+            self._give(key)
+            return False
+        return True
+
+    def _give(self, key):
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+
+
+class LocalHashingSlots:
+    """
+    The same bounds kept with a semaphore in this process, for caches that
+    are not shared (see check core.W001): each process is then limited
+    separately.
+    """
+
+    def __init__(self, concurrency, queue_size):
+        self.queue_size = queue_size
+        self._running = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self._running is None:
+            return False
+        if self._running.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.queue_size:
+                return False
+            self._waiting += 1
+        try:
+            return self._running.acquire(timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self):
+        self._running.release()
+
+
+_local_slots = {}
+_local_slots_lock = threading.Lock()
+
+
+def get_hashing_slots():
+    if is_shared_cache():
+        return SharedHashingSlots()
+    bounds = (settings.PASSWORD_HASH_CONCURRENCY, settings.PASSWORD_HASH_QUEUE_SIZE)
+    with _local_slots_lock:
+        if bounds not in _local_slots:
+            _local_slots[bounds] = LocalHashingSlots(*bounds)
+        return _local_slots[bounds]
+
+
+@contextmanager
+def hashing_slot():
+    """Hold a hashing slot, waiting in the bounded queue if need be; raise PasswordHashingBusy if none comes."""
+    slots = get_hashing_slots()
+    if not slots.acquire():
+        raise PasswordHashingBusy()
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+class BoundedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's default PBKDF2 hasher, computing a hash only while it holds a
+    hashing slot. It keeps the ``pbkdf2_sha256`` algorithm name, so existing
+    password hashes stay valid.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        # verify() and harden_runtime() both hash through encode(), so this is
+        # the only place a slot is taken (and it is never re-entered).
+        with hashing_slot():
+            return super().encode(password, salt, iterations)
+
+
+class PasswordHashingBusyMiddleware:
+    """Answer PasswordHashingBusy outside DRF views (e.g. the admin login) with a 429."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        response = JsonResponse({'detail': exception.detail}, status=exception.status_code)
+        response['Retry-After'] = str(exception.wait)
+        return response
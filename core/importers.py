@@ -0,0 +1,349 @@
+"""
+Bulk task import from CSV or ICS files.
+
+The file is parsed as a stream of records, each validated with the task
+serializer, and the valid ones are written a batch at a time with
+bulk_create. Categories are resolved (or created) once per name and the
+task's category snapshot is filled in at insert time, so a batch costs a
+fixed handful of queries however many tasks and categories it holds.
+
+CSV files need a header row with a ``title`` column; ``description``,
+``due_date``, ``is_all_day``, ``priority``, ``status`` and ``categories``
+(names separated by ``;``) are optional. ICS files import every VTODO and
+VEVENT.
+"""
+import csv
+import io
+import re
+import zoneinfo
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate
+from .filters import parse_datetime_param
+from .models import Category, Task, TaskAccess, TaskCategory
+from .serializers import CategorySerializer, TaskSerializer
+
+IMPORT_BATCH_SIZE = 500
+# Rows past this many failures are still counted, just not described.
+IMPORT_MAX_ERRORS = 1000
+IMPORT_FORMATS = ('csv', 'ics')
+
+CSV_FIELDS = ('title', 'description', 'due_date', 'is_all_day', 'priority', 'status', 'categories')
+CSV_CATEGORY_SEPARATOR = ';'
+
+ICS_COMPONENTS = ('VTODO', 'VEVENT')
+ICS_ESCAPE = re.compile(r'\\([\\;,nN])')
+ICS_DATE = re.compile(r'^(\d{4})(\d{2})(\d{2})$')
+ICS_DATETIME = re.compile(r'^(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})(Z?)$')
+
+
+class ImportFileError(Exception):
+    """
+    Raised when the rest of a file cannot be read, as opposed to a bad row.
+    ``line`` is where reading failed, when that is known.
+    """
+
+    def __init__(self, message, line=None):
+        super().__init__(message)
+        self.line = line
+
+
+def detect_format(name, content_type=''):
+    """Guess csv or ics from an upload's file name or content type."""
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension in IMPORT_FORMATS:
+        return extension
+    if content_type.startswith('text/calendar'):
+        return 'ics'
+    if content_type.startswith('text/csv'):
+        return 'csv'
+    return None
+
+
+def read_records(binary_file, format, tz):
+    """Yield ``(line number, record)`` pairs from a binary file object."""
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        if format == 'csv':
+            yield from read_csv(text, tz)
+        else:
+            yield from read_ics(text, tz)
+    except UnicodeDecodeError:
+        raise ImportFileError('The file must be UTF-8 encoded.')
+    except csv.Error as e:
+        raise ImportFileError(f'Malformed CSV: {e}')
+    finally:
+        # Leave the underlying file to whoever opened it.
+        text.detach()
+
+
+def read_csv(text, tz):
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower().replace(' ', '_') for name in reader.fieldnames]
+    if 'title' not in reader.fieldnames:
+        raise ImportFileError('The CSV header must include a title column.', line=1)
+
+    # The failing record starts after the last one read; line_num is not
+    # reliable once the reader has raised.
+    read_upto = reader.line_num
+    try:
+        for row in reader:
+            read_upto = reader.line_num
+            record = {
+                name: value.strip() for name, value in row.items()
+                if name in CSV_FIELDS and isinstance(value, str) and value.strip()
+            }
+            record['categories'] = [
+                name.strip() for name in record.pop('categories', '').split(CSV_CATEGORY_SEPARATOR)
+                if name.strip()
+            ]
+            if 'priority' in record:
+                record['priority'] = record['priority'].lower()
+            if 'status' in record:
+                record['status'] = record['status'].lower()
+            if 'due_date' in record:
+                due_date = parse_datetime_param(record['due_date'], tz)
+                if due_date is not None:
+                    # A bare date is an all-day task unless the file says otherwise.
+                    if parse_date(record['due_date']) is not None:
+                        record.setdefault('is_all_day', 'true')
+                    record['due_date'] = due_date
+            yield reader.line_num, record
+    except csv.Error as e:
+        raise ImportFileError(f'Malformed CSV: {e}', line=read_upto + 1)
+
+
+def _unfolded_lines(text):
+    """Join RFC 5545 folded lines, yielding ``(line number, line)``."""
+    pending, pending_number = None, 0
+    for number, raw in enumerate(text, 1):
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending:
+            yield pending_number, pending
+        pending, pending_number = line, number
+    if pending:
+        yield pending_number, pending
+
+
+def _content_line(line):
+    """Split ``NAME;PARAM=value:VALUE`` into (name, params, value)."""
+    quoted = False
+    for position, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:position], line[position + 1:]
+            break
+    else:
+        return None, {}, ''
+    name, *raw_params = head.split(';')
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _ics_text(value):
+    return ICS_ESCAPE.sub(lambda match: '\n' if match[1] in 'nN' else match[1], value)
+
+
+def _ics_datetime(value, params, tz):
+    """Return (datetime, is_all_day), or the raw value when it does not parse."""
+    date_match = ICS_DATE.match(value)
+    if date_match:
+        try:
+            day = datetime(*map(int, date_match.groups())).date()
+        except ValueError:
+            return value, False
+        return datetime.combine(day, time.min, tzinfo=tz), True
+
+    match = ICS_DATETIME.match(value)
+    if match is None:
+        return value, False
+    *parts, utc = match.groups()
+    if utc:
+        zone = dt_timezone.utc
+    else:
+        try:
+            zone = zoneinfo.ZoneInfo(params['TZID']) if 'TZID' in params else tz
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            zone = tz
+    try:
+        return datetime(*map(int, parts), tzinfo=zone), False
+    except ValueError:
+        return value, False
+
+
+def _ics_priority(value):
+    # RFC 5545: 1-4 high, 5 medium, 6-9 low, 0 undefined.
+    if not value.isdigit() or int(value) == 0:
+        return None
+    level = int(value)
+    return 'high' if level <= 4 else 'medium' if level == 5 else 'low'
+
+
+def read_ics(text, tz):
+    record, start, depth = None, 0, 0
+    for number, line in _unfolded_lines(text):
+        name, params, value = _content_line(line)
+        if name == 'BEGIN':
+            if record is not None:
+                depth += 1  # A VALARM or other nested component.
+            elif value.upper() in ICS_COMPONENTS:
+                record, start, depth = {'categories': []}, number, 0
+            continue
+        if record is None:
+            continue
+        if name == 'END':
+            if depth:
+                depth -= 1
+            elif value.upper() in ICS_COMPONENTS:
+                record.pop('_dtstart', None)
+                yield start, record
+                record = None
+            continue
+        if depth:
+            continue
+
+        if name == 'SUMMARY':
+            record['title'] = _ics_text(value).strip()
+        elif name == 'DESCRIPTION':
+            record['description'] = _ics_text(value)
+        elif name in ('DUE', 'DTSTART'):
+            # A to-do's DUE wins over its DTSTART.
+            if name == 'DUE' or 'due_date' not in record or record.get('_dtstart'):
+                record['due_date'], record['is_all_day'] = _ics_datetime(value.strip(), params, tz)
+                record['_dtstart'] = name == 'DTSTART'
+        elif name == 'STATUS':
+            if value.strip().upper() == 'COMPLETED':
+                record['status'] = 'completed'
+        elif name == 'PRIORITY':
+            priority = _ics_priority(value.strip())
+            if priority:
+                record['priority'] = priority
+        elif name == 'CATEGORIES':
+            record['categories'].extend(
+                category for category in (
+                    _ics_text(part).strip() for part in re.split(r'(?<!\\),', value)
+                )
+                if category
+            )
+
+
+def import_tasks(user, records, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Create the user's tasks from ``(line number, record)`` pairs. Valid rows
+    are written in batches of ``batch_size``, each in its own transaction;
+    invalid rows are skipped and reported. ``progress`` is called with the
+    report after every batch. Returns the report.
+
+    If the file turns out to be unreadable part way (an ImportFileError),
+    the valid rows before that point are still written and the report's
+    ``error`` says where and why reading stopped; it is None otherwise.
+    """
+    report = {
+        'processed': 0, 'created': 0, 'failed': 0, 'categories_created': 0, 'errors': [], 'error': None
+    }
+    # One serializer for the whole file, so its fields are only built once.
+    serializer = TaskSerializer()
+    max_name_length = Category._meta.get_field('name').max_length
+    categories = {}
+    batch = []
+
+    try:
+        for line, record in records:
+            report['processed'] += 1
+            names = list(dict.fromkeys(record.pop('categories', ())))
+            errors = {}
+            try:
+                validated = serializer.run_validation(record)
+            except ValidationError as e:
+                errors.update(e.detail)
+            too_long = [name for name in names if len(name) > max_name_length]
+            if too_long:
+                errors['categories'] = [
+                    f'Category names must be at most {max_name_length} characters: {too_long}'
+                ]
+
+            if errors:
+                report['failed'] += 1
+                if len(report['errors']) < IMPORT_MAX_ERRORS:
+                    report['errors'].append({'line': line, 'errors': errors})
+            else:
+                batch.append((validated, names))
+
+            if len(batch) >= batch_size:
+                _write_batch(user, batch, categories, report)
+                batch = []
+                if progress is not None:
+                    progress(report)
+    except ImportFileError as e:
+        # Earlier batches are already committed, so say exactly how far the import got.
+        report['error'] = {'line': e.line, 'detail': str(e)}
+
+    if batch:
+        _write_batch(user, batch, categories, report)
+    if progress is not None:
+        progress(report)
+    return report
+
+
+def _write_batch(user, batch, categories, report):
+    """Insert one batch of validated tasks; ``categories`` caches name -> serialized category."""
+    with transaction.atomic():
+        created = _resolve_categories(
+            user, {name for _, names in batch for name in names} - categories.keys(), categories
+        )
+        tasks = Task.objects.bulk_create(
+            Task(
+                user=user,
+                category_snapshot=sorted((categories[name] for name in names), key=lambda c: c['id']),
+                **validated
+            )
+            for validated, names in batch
+        )
+        TaskAccess.objects.bulk_create(
+            (TaskAccess(user=user, task=task, permission=TaskAccess.PERMISSION_OWNER)
+             for task in tasks),
+            ignore_conflicts=True
+        )
+        TaskCategory.objects.bulk_create(
+            TaskCategory(task=task, category_id=categories[name]['id'])
+            for task, (_, names) in zip(tasks, batch) for name in names
+        )
+
+    report['created'] += len(tasks)
+    if created:
+        report['categories_created'] += created
+        # bulk_create sends no post_save, so drop the cached category lists here.
+        invalidate(Category, user.pk)
+
+
+def _resolve_categories(user, names, categories):
+    """Load or create the named categories into ``categories``; returns how many were created."""
+    if not names:
+        return 0
+    found = {category.name: category for category in Category.objects.filter(user=user, name__in=names)}
+    missing = names - found.keys()
+    if missing:
+        # ignore_conflicts covers a concurrent import creating the same name.
+        Category.objects.bulk_create(
+            (Category(user=user, name=name) for name in missing), ignore_conflicts=True
+        )
+        found.update(
+            (category.name, category)
+            for category in Category.objects.filter(user=user, name__in=missing)
+        )
+    for name, category in found.items():
+        categories[name] = dict(CategorySerializer(category).data)
+    return len(missing)
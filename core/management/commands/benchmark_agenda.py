@@ -0,0 +1,80 @@
+import statistics
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Task, TaskAccess
+
+User = get_user_model()
+
+BASE = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def due_date(i):
+    # Alternate around BASE, one task an hour, so the first n tasks always
+    # fill the same hours around it: a larger table adds tasks outside every
+    # window instead of more tasks inside it.
+    return BASE + timedelta(hours=(i + 1) // 2 * (-1) ** i)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the agenda query (Task.objects.in_window) for a throwaway user '
+        'with a tenth of --tasks and then all of them, for several window '
+        'sizes, and print the rows returned and the median time of each. The '
+        'time should follow the window size, not the table size. The data is '
+        'rolled back afterwards. Run it against the production database '
+        'engine; SQLite plans say little about PostgreSQL ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100_000, help='Tasks the user has in the final run.')
+        parser.add_argument(
+            '--window', type=int, action='append', dest='windows', metavar='DAYS',
+            help='Window size in days; repeat for several (default: 1, 7 and 31).'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per window.')
+
+    def handle(self, *args, **options):
+        if options['tasks'] < 10:
+            raise CommandError('Pass --tasks 10 or more.')
+        windows = options['windows'] or [1, 7, 31]
+
+        with transaction.atomic():
+            user = User.objects.create(username=f'agenda-benchmark-{timezone.now().timestamp()}')
+            seeded = 0
+            for size in (options['tasks'] // 10, options['tasks']):
+                self.seed(user, seeded, size)
+                seeded = size
+                for days in windows:
+                    rows, median = self.time_window(user, days, options['repeat'])
+                    self.stdout.write(f'{size} tasks, {days}-day window: {rows} rows, median {median * 1000:.1f} ms')
+            transaction.set_rollback(True)
+
+    def seed(self, user, start, stop):
+        tasks = Task.objects.bulk_create(
+            (Task(user=user, title=f'Task {i}', due_date=due_date(i), is_all_day=i % 10 == 0)
+             for i in range(start, stop)),
+            batch_size=5000,
+        )
+        TaskAccess.objects.bulk_create(
+            (TaskAccess(user=user, task=task, permission=TaskAccess.PERMISSION_OWNER) for task in tasks),
+            batch_size=5000,
+        )
+        # Plan with statistics for the table as it is now.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def time_window(self, user, days, repeat):
+        start = BASE - timedelta(days=days) / 2
+        end = start + timedelta(days=days)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(list(Task.objects.in_window(user, start, end, dt_timezone.utc)))
+            timings.append(time.perf_counter() - started)
+        return rows, statistics.median(timings)
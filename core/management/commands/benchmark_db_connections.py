@@ -0,0 +1,59 @@
+import time
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .compare_servers import DEFAULT_PATHS, Command as CompareServersCommand
+
+
+class Command(CompareServersCommand):
+    help = (
+        'Load-test read endpoints through the WSGI application on a pool of '
+        'worker threads (one database connection each, as in a Passenger '
+        'worker), first opening a new connection for every request '
+        '(CONN_MAX_AGE=0) and then keeping connections open between requests, '
+        'and print the latency of each and the connections opened. Run it '
+        'against the production database engine; connecting to SQLite costs '
+        'next to nothing.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--conn-max-age', type=int,
+            help='CONN_MAX_AGE of the persistent run (default: the configured one, or 60 if that is 0).'
+        )
+
+    def handle(self, *args, **options):
+        self.token = self.token_for(options['user'])
+        self.host = options['host']
+        app = get_wsgi_application()
+        database = connections.settings['default']
+        configured = database['CONN_MAX_AGE']
+        persistent = options['conn_max_age'] or configured or 60
+
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection.alias == 'default':
+                opened.append(connection)
+        connection_created.connect(count)
+        try:
+            for path in options['paths'] or DEFAULT_PATHS:
+                for conn_max_age in (0, persistent):
+                    # Every thread's connection reads this same settings dict.
+                    database['CONN_MAX_AGE'] = conn_max_age
+                    opened.clear()
+                    started = time.perf_counter()
+                    results = self.run_wsgi(app, path, options['requests'], options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    self.report(f'CONN_MAX_AGE={conn_max_age}', path, results, elapsed)
+                    self.stdout.write(f'  {len(opened)} connections opened')
+                    for connection in opened:
+                        # Left open by the worker threads, which are gone now.
+                        connection.inc_thread_sharing()
+                        connection.close()
+        finally:
+            connection_created.disconnect(count)
+            database['CONN_MAX_AGE'] = configured
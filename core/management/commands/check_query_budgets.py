@@ -0,0 +1,131 @@
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import views
+from core.models import (
+    Badge, Category, Task, TaskCategory, Streak, UserBadge,
+    SharedPlan, SharedPlanMember, SharedPlanTask
+)
+
+User = get_user_model()
+
+# (name, view, URL, kwargs, query budget). A budget covers the whole request,
+# including ETag and cache lookups, and must not depend on the number of rows.
+ENDPOINTS = [
+    ('task list', views.TaskViewSet.as_view({'get': 'list'}), '/api/tasks/', {}, 4),
+    ('task detail', views.TaskViewSet.as_view({'get': 'retrieve'}), '/api/tasks/{task}/', {'pk': 'task'}, 4),
+    ('task agenda', views.TaskViewSet.as_view({'get': 'agenda'}), '/api/tasks/agenda/?start=2000-01-01&end=2000-12-31', {}, 2),
+    ('category list', views.CategoryViewSet.as_view({'get': 'list'}), '/api/categories/', {}, 1),
+    ('streak list', views.StreakViewSet.as_view({'get': 'list'}), '/api/streaks/', {}, 1),
+    ('user badge list', views.UserBadgeViewSet.as_view({'get': 'list'}), '/api/user-badges/', {}, 1),
+    ('shared plan list', views.SharedPlanViewSet.as_view({'get': 'list'}), '/api/shared-plans/', {}, 4),
+    ('shared plan detail', views.SharedPlanViewSet.as_view({'get': 'retrieve'}), '/api/shared-plans/{plan}/', {'pk': 'plan'}, 4),
+    ('shared plan task list', views.SharedPlanTaskViewSet.as_view({'get': 'list'}), '/api/shared-plan-tasks/', {}, 3),
+]
+
+
+
+def private_cache():
+    """
+    Swap in a new, empty local cache. Seeds are rolled back, so a later seed
+    may reuse their ids, and a response cached for the earlier rows would
+    answer without a single query.
+    """
+    return override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'query-budgets-{uuid.uuid4().hex}',
+    }})
+
+
+def request_endpoint(view, path, kwargs, user, ids):
+    """GET one ENDPOINTS entry as ``user`` and return the fully rendered response."""
+    request = APIRequestFactory().get(path.format(**ids))
+    force_authenticate(request, user=user)
+    response = view(request, **{key: ids[value] for key, value in kwargs.items()})
+    if response.streaming:
+        b''.join(response.streaming_content)
+    else:
+        response.render()
+    return response
+
+
+class Command(BaseCommand):
+    help = (
+        'Count the queries each main API endpoint runs over seeded data of '
+        'two sizes and fail on any endpoint that goes over its budget or '
+        'whose query count grows with the data (an N+1).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5, help='Rows per relation in the smaller seed.')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        small = self.measure(size)
+        large = self.measure(size * 3)
+
+        failures = []
+        for name, view, path, kwargs, budget in ENDPOINTS:
+            counts = (small[name], large[name])
+            line = f'{name}: {counts[0]} / {counts[1]} queries (budget {budget})'
+            if counts[0] != counts[1] or counts[1] > budget:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(line))
+                for query in large[f'{name}:sql']:
+                    self.stdout.write(f'    {query}')
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f"Over budget: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('All endpoints are within their query budgets.'))
+
+    def measure(self, size):
+        """Seed ``size`` rows per relation and count every endpoint's queries; rolled back afterwards."""
+        results = {}
+        with private_cache(), transaction.atomic():
+            user, ids = self.seed(size)
+            for name, view, path, kwargs, budget in ENDPOINTS:
+                with CaptureQueriesContext(connection) as queries:
+                    response = request_endpoint(view, path, kwargs, user, ids)
+                if response.status_code != 200:
+                    raise CommandError(f'{name} answered {response.status_code}.')
+                results[name] = len(queries)
+                results[f'{name}:sql'] = [query['sql'] for query in queries]
+            transaction.set_rollback(True)
+        return results
+
+    def seed(self, size):
+        stamp = timezone.now().timestamp()
+        user = User.objects.create_user(username=f'query-budget-{size}-{stamp}')
+        others = [User.objects.create_user(username=f'query-budget-{size}-{i}-{stamp}') for i in range(size)]
+        categories = [Category.objects.create(user=user, name=f'Category {i}') for i in range(size)]
+        due_date = datetime(2000, 6, 1, tzinfo=dt_timezone.utc)
+        parents = [Task.objects.create(user=user, title=f'Task {i}', due_date=due_date) for i in range(size)]
+        for parent in parents:
+            for i in range(2):
+                child = Task.objects.create(user=user, title=f'Subtask {i}', parent_task=parent, due_date=due_date)
+                Task.objects.create(user=user, title='Nested subtask', parent_task=child)
+            for category in categories:
+                TaskCategory.objects.create(task=parent, category=category)
+
+        for i in range(size):
+            Streak.objects.create(user=user, date=due_date.date() - timedelta(days=i))
+            badge = Badge.objects.create(code=f'query-budget-{size}-{i}-{stamp}', name='Badge', description='', icon_url='')
+            UserBadge.objects.create(user=user, badge=badge)
+
+            plan = SharedPlan.objects.create(owner=others[i], name=f'Plan {i}')
+            SharedPlanMember.objects.create(shared_plan=plan, user=user)
+            for other in others:
+                if other != others[i]:
+                    SharedPlanMember.objects.create(shared_plan=plan, user=other)
+            for task in parents:
+                SharedPlanTask.objects.create(shared_plan=plan, task=task)
+        return user, {'task': parents[0].pk, 'plan': plan.pk}
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.query_plans import check_plans, seed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the list querysets of the main viewsets and fail if any of '
+        'them is not served by its expected index. Postgres only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose querysets are explained.')
+        parser.add_argument(
+            '--seed', type=int, default=0, metavar='USERS',
+            help='Seed this many throwaway users with data; rolled back afterwards.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plan checks need a PostgreSQL database.')
+        if not options['user'] and not options['seed']:
+            raise CommandError('Pass --user or --seed.')
+
+        with transaction.atomic():
+            if options['seed']:
+                user = seed(users=options['seed'])
+            else:
+                try:
+                    user = User.objects.get(username=options['user'])
+                except User.DoesNotExist:
+                    raise CommandError(f"User {options['user']!r} does not exist.")
+            results = check_plans(user)
+            transaction.set_rollback(True)
+
+        failures = []
+        for name, plan, expected, ok in results:
+            if ok:
+                self.stdout.write(f'{name}: ok')
+            else:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f"{name}: none of {', '.join(sorted(expected)) or 'no index'} used:\n{plan}\n"
+                ))
+        if failures:
+            raise CommandError(f"Missing index use in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('All querysets use their indexes.'))
@@ -0,0 +1,150 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+DEFAULT_PATHS = ['/api/tasks/', '/api/streaks/', '/api/auth/user/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test read endpoints through the WSGI application (what '
+        'passenger_wsgi.py serves) on a pool of worker threads and through '
+        'the ASGI application on one event loop, in this process, and print '
+        'the throughput and latency of each. Run it with ASYNC_API_VIEWS=True '
+        'against the production database engine; numbers from SQLite say '
+        'little about waiting on database round trips.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username whose access token the requests carry.')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help=f"Path to request; repeat for several (default: {', '.join(DEFAULT_PATHS)})."
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Requests per path and server.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Requests in flight at once: WSGI worker threads, or concurrent ASGI requests.'
+        )
+        parser.add_argument('--host', default='localhost', help='Host header; must be in ALLOWED_HOSTS.')
+
+    def handle(self, *args, **options):
+        if not settings.ASYNC_API_VIEWS:
+            raise CommandError('Set ASYNC_API_VIEWS=True so the ASGI application serves the async views.')
+        self.token = self.token_for(options['user'])
+        self.host = options['host']
+        wsgi_app = get_wsgi_application()
+        asgi_app = get_asgi_application()
+
+        for path in options['paths'] or DEFAULT_PATHS:
+            for server, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                started = time.perf_counter()
+                results = run(wsgi_app if server == 'wsgi' else asgi_app, path,
+                              options['requests'], options['concurrency'])
+                elapsed = time.perf_counter() - started
+                self.report(server, path, results, elapsed)
+
+    def token_for(self, username):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'User {username!r} does not exist.')
+        return f'Bearer {AccessToken.for_user(user)}'
+
+    def report(self, server, path, results, elapsed):
+        latencies = sorted(latency for latency, status in results)
+        errors = sum(1 for latency, status in results if status != 200)
+        cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        line = (
+            f'{server} {path}: {len(results) / elapsed:.0f} req/s, '
+            f'p50 {cuts[49] * 1000:.1f} ms, p95 {cuts[94] * 1000:.1f} ms, p99 {cuts[98] * 1000:.1f} ms'
+        )
+        if errors:
+            self.stdout.write(self.style.ERROR(f'{line}, {errors} non-200 responses'))
+        else:
+            self.stdout.write(line)
+
+    def run_wsgi(self, app, path, requests, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda _: self.wsgi_request(app, path), range(requests)))
+
+    def wsgi_request(self, app, path):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'HTTP_HOST': self.host,
+            'HTTP_AUTHORIZATION': self.token,
+            'wsgi.input': BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        started = time.perf_counter()
+        body = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for chunk in body:
+                pass
+        finally:
+            # Closing the response fires request_finished, as a WSGI server does.
+            body.close()
+        return time.perf_counter() - started, int(statuses[0].split()[0])
+
+    def run_asgi(self, app, path, requests, concurrency):
+        async def run():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with limit:
+                    return await self.asgi_request(app, path)
+            return await asyncio.gather(*(one() for _ in range(requests)))
+        return asyncio.run(run())
+
+    async def asgi_request(self, app, path):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'root_path': '',
+            'headers': [(b'host', self.host.encode()), (b'authorization', self.token.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        body_sent = False
+        statuses = []
+
+        async def receive():
+            nonlocal body_sent
+            if body_sent:
+                # Django listens for a disconnect until the response is sent,
+                # then cancels this wait.
+                await asyncio.Event().wait()
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        return time.perf_counter() - started, statuses[0]
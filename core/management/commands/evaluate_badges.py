@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.badges import evaluate_all
+
+
+class Command(BaseCommand):
+    help = 'Award every rule-based badge users qualify for but do not hold yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only evaluate this user id (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Users evaluated per batch.')
+
+    def handle(self, *args, **options):
+        awarded = evaluate_all(chunk_size=options['chunk_size'], user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Awarded {awarded} badges.'))
@@ -0,0 +1,62 @@
+import zoneinfo
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import IMPORT_BATCH_SIZE, IMPORT_FORMATS, detect_format, import_tasks, read_records
+
+
+class Command(BaseCommand):
+    help = 'Import tasks for a user from a CSV or ICS file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The CSV or ICS file.')
+        parser.add_argument('--user', required=True, help='Username or id of the owner.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, dest='file_format',
+                            help='File format; guessed from the extension by default.')
+        parser.add_argument('--tz', default=settings.TIME_ZONE,
+                            help='Time zone of dates without one.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Tasks inserted per transaction.')
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'username': options['user']}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']}.")
+        file_format = options['file_format'] or detect_format(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot tell the file format; pass --format.')
+        try:
+            tz = zoneinfo.ZoneInfo(options['tz'])
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise CommandError(f"Unknown time zone {options['tz']}.")
+
+        def progress(report):
+            self.stdout.write(
+                f"{report['processed']} rows read, {report['created']} tasks created, "
+                f"{report['failed']} rows failed"
+            )
+
+        try:
+            with open(options['path'], 'rb') as binary_file:
+                report = import_tasks(
+                    user, read_records(binary_file, file_format, tz),
+                    batch_size=options['batch_size'], progress=progress
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        summary = (
+            f"Imported {report['created']} tasks and created {report['categories_created']} "
+            f"categories; {report['failed']} rows failed."
+        )
+        if report['error'] is not None:
+            line = report['error']['line']
+            where = f' at line {line}' if line is not None else ''
+            raise CommandError(f"{summary} Reading stopped{where}: {report['error']['detail']}")
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired outstanding and blacklisted JWT refresh tokens in small '
+        'chunks, so no long-running lock is held on the token tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to pause between chunks to limit load on the database.'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    OutstandingToken.objects.filter(expires_at__lt=now)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:options['chunk_size']]
+                )
+                if not ids:
+                    break
+                # Blacklist rows go with their outstanding token through the cascade.
+                _, deleted = OutstandingToken.objects.filter(pk__in=ids).delete()
+                total += deleted.get(OutstandingToken._meta.label, 0)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired tokens.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+from core.sync import TOMBSTONE_RETENTION
+
+
+class Command(BaseCommand):
+    help = 'Delete delta sync tombstones older than the retention window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - TOMBSTONE_RETENTION
+        total = 0
+        while True:
+            ids = list(
+                Tombstone.objects.filter(deleted_at__lt=cutoff)
+                .values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not ids:
+                break
+            deleted, _ = Tombstone.objects.filter(pk__in=ids).delete()
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} tombstones.'))
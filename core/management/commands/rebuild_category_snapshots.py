@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Task
+from core.snapshots import refresh_category_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every task\'s denormalized category snapshot from TaskCategory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Tasks rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        task_ids = Task.objects.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        last_id = 0
+        while True:
+            chunk = list(task_ids.filter(pk__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                refresh_category_snapshots(chunk, batch_size=chunk_size)
+            total += len(chunk)
+            last_id = chunk[-1]
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt category snapshots for {total} tasks.'))
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import StreakSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every user\'s streak summary from their Streak history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user id (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Users rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        if options['users']:
+            user_ids = user_ids.filter(pk__in=options['users'])
+
+        total = 0
+        chunk_size = options['chunk_size']
+        last_id = 0
+        while True:
+            chunk = list(user_ids.filter(pk__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                StreakSummary.objects.rebuild(chunk)
+            total += len(chunk)
+            last_id = chunk[-1]
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} streak summaries.'))
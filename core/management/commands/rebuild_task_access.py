@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.access import diff_task_access, rebuild_task_access, sync_task_access
+from core.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Check the TaskAccess table against plan membership and task ownership, and repair it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift; exit with an error if any is found.'
+        )
+        parser.add_argument(
+            '--from-scratch', action='store_true',
+            help='Delete and re-derive every access row, chunk by chunk.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['check'] and options['from_scratch']:
+            raise CommandError('--check and --from-scratch are mutually exclusive.')
+
+        if options['from_scratch']:
+            created = revoked = 0
+            for task_ids in self.task_id_chunks(options['chunk_size']):
+                with transaction.atomic():
+                    counts = rebuild_task_access(task_ids)
+                created += counts[0]
+                revoked += counts[1]
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt TaskAccess from scratch: rows={created} revoked={revoked}'
+            ))
+            return
+
+        created = updated = deleted = 0
+        for task_ids in self.task_id_chunks(options['chunk_size']):
+            if options['check']:
+                to_create, to_update, to_delete = diff_task_access(task_ids)
+                counts = (len(to_create), len(to_update), len(to_delete))
+            else:
+                with transaction.atomic():
+                    counts = sync_task_access(task_ids)
+            created += counts[0]
+            updated += counts[1]
+            deleted += counts[2]
+
+        summary = f'missing={created} wrong_permission={updated} stale={deleted}'
+        if options['check']:
+            if created or updated or deleted:
+                raise CommandError(f'TaskAccess is out of sync: {summary}')
+            self.stdout.write(self.style.SUCCESS('TaskAccess is consistent.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired TaskAccess: {summary}'))
+
+    def task_id_chunks(self, chunk_size):
+        last_id = 0
+        while True:
+            task_ids = list(
+                Task.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not task_ids:
+                return
+            yield task_ids
+            last_id = task_ids[-1]
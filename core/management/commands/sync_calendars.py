@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.calendar_sync import run_syncs
+from core.models import CalendarSync
+
+
+class Command(BaseCommand):
+    help = 'Sync calendar accounts that are due, concurrently. Run it from cron, or with --loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only sync this user id (repeatable).')
+        parser.add_argument('--provider', action='append', dest='providers',
+                            help='Only sync this provider (repeatable).')
+        parser.add_argument('--all', action='store_true',
+                            help='Sync every account, not just those due.')
+        parser.add_argument('--concurrency', type=int, default=settings.CALENDAR_SYNC_CONCURRENCY,
+                            help='Accounts synced at once.')
+        parser.add_argument('--loop', type=int, metavar='SECONDS',
+                            help='Keep running, checking for due accounts every SECONDS.')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once(options)
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
+
+    def run_once(self, options):
+        accounts = CalendarSync.objects.filter(provider__in=settings.CALENDAR_SYNC_PROVIDERS)
+        if not options['all']:
+            accounts = accounts.due(settings.CALENDAR_SYNC_INTERVAL)
+        if options['users']:
+            accounts = accounts.filter(user_id__in=options['users'])
+        if options['providers']:
+            accounts = accounts.filter(provider__in=options['providers'])
+
+        results = run_syncs(accounts.order_by('synced_at', 'pk'), max_workers=options['concurrency'])
+        failed = [result for result in results if result['error']]
+        for result in failed:
+            self.stderr.write(f"Account {result['account']}: {result['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {len(results) - len(failed)} of {len(results)} accounts: "
+            f"{sum(r['created'] for r in results)} created, {sum(r['updated'] for r in results)} updated, "
+            f"{sum(r['deleted'] for r in results)} deleted."
+        ))
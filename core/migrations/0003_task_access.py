@@ -0,0 +1,60 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+RANK = {'view': 1, 'edit': 2, 'owner': 3}
+
+
+def populate_task_access(apps, schema_editor):
+    Task = apps.get_model('core', 'Task')
+    SharedPlanTask = apps.get_model('core', 'SharedPlanTask')
+    TaskAccess = apps.get_model('core', 'TaskAccess')
+
+    rows = {}
+    for task_id, user_id in Task.objects.values_list('pk', 'user_id').iterator():
+        rows[(user_id, task_id)] = 'owner'
+    memberships = SharedPlanTask.objects.filter(
+        shared_plan__sharedplanmember__isnull=False
+    ).values_list(
+        'task_id',
+        'shared_plan__sharedplanmember__user_id',
+        'shared_plan__sharedplanmember__permission'
+    )
+    for task_id, user_id, permission in memberships.iterator():
+        current = rows.get((user_id, task_id))
+        if current is None or RANK[permission] > RANK[current]:
+            rows[(user_id, task_id)] = permission
+
+    TaskAccess.objects.bulk_create(
+        (TaskAccess(user_id=user_id, task_id=task_id, permission=permission)
+         for (user_id, task_id), permission in rows.items()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_task_and_member_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.CharField(choices=[('view', 'View'), ('edit', 'Edit'), ('owner', 'Owner')], max_length=10)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='core.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Task Access',
+                'unique_together': {('user', 'task')},
+            },
+        ),
+        migrations.RunPython(populate_task_access, migrations.RunPython.noop),
+    ]
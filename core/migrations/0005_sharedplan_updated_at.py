@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_sync_watermarks_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharedplan',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:23
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Title matches (A) rank above description matches (B). The config must match
+# core.filters.SEARCH_CONFIG.
+CREATE_TRIGGER = """
+    CREATE FUNCTION core_task_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER core_task_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description ON core_task
+        FOR EACH ROW EXECUTE FUNCTION core_task_search_vector_update();
+
+    UPDATE core_task SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B');
+
+    CREATE INDEX task_search_vector_idx ON core_task USING gin (search_vector);
+"""
+
+DROP_TRIGGER = """
+    DROP INDEX IF EXISTS task_search_vector_idx;
+    DROP TRIGGER IF EXISTS core_task_search_vector_trigger ON core_task;
+    DROP FUNCTION IF EXISTS core_task_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_streak_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
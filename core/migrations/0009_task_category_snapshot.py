@@ -0,0 +1,47 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:27
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from rest_framework import serializers
+
+
+def populate_category_snapshots(apps, schema_editor):
+    # Same shape as CategorySerializer output; the historical models cannot
+    # go through the real serializer.
+    Task = apps.get_model('core', 'Task')
+    TaskCategory = apps.get_model('core', 'TaskCategory')
+    datetime_field = serializers.DateTimeField()
+
+    snapshots = defaultdict(list)
+    links = TaskCategory.objects.select_related('category').order_by('task_id', 'category_id')
+    for link in links.iterator(chunk_size=2000):
+        category = link.category
+        snapshots[link.task_id].append({
+            'id': category.pk,
+            'name': category.name,
+            'color_hex': category.color_hex,
+            'created_at': datetime_field.to_representation(category.created_at),
+            'updated_at': datetime_field.to_representation(category.updated_at),
+        })
+    Task.objects.bulk_update(
+        [Task(pk=task_id, category_snapshot=snapshot) for task_id, snapshot in snapshots.items()],
+        ['category_snapshot'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_task_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='category_snapshot',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(populate_category_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_task_category_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarSyncTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='calendarsync',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='calendarsync',
+            name='sync_token',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='calendarsync',
+            index=models.Index(fields=['synced_at'], name='calendarsync_synced_idx'),
+        ),
+        migrations.AddField(
+            model_name='calendarsynctask',
+            name='calendar_sync',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='links', to='core.calendarsync'),
+        ),
+        migrations.AddField(
+            model_name='calendarsynctask',
+            name='task',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_link', to='core.task'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='calendarsynctask',
+            unique_together={('calendar_sync', 'external_id')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_calendar_sync_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarsync',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_calendarsync_locked_until'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskaccess',
+            index=models.Index(condition=models.Q(('permission', 'owner'), _negated=True), fields=['user', 'task'], name='taskaccess_user_shared_idx'),
+        ),
+    ]
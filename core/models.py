@@ -1,16 +1,178 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, connection, DEFAULT_DB_ALIAS
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .cache import invalidate, user_row_cache
+
+class LazyUser(User):
+    """
+    User built from an access token's user id claim. Its row is only read
+    when a view touches an attribute other than the id, and then all at once
+    (or from user_row_cache when that is enabled). A deactivated user fails
+    authentication as soon as the row is loaded.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def for_id(cls, user_id):
+        row = user_row_cache.get(user_id)
+        if row is not None:
+            return cls.from_db(DEFAULT_DB_ALIAS, list(row), list(row.values()))
+        return cls.from_db(DEFAULT_DB_ALIAS, ['id'], [user_id])
+
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.intersection(fields):
+            # Load every deferred column in one query instead of one per attribute.
+            fields = list(deferred.union(fields))
+        try:
+            super().refresh_from_db(using=using, fields=fields)
+        except self.DoesNotExist:
+            raise PermissionDenied('User no longer exists.')
+        if not self.get_deferred_fields():
+            user_row_cache.set(self.pk, {
+                field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields
+            })
+        if 'is_active' not in self.get_deferred_fields() and not self.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Tasks the user owns or that sit in a shared plan they belong to."""
+        return self.filter(access__user=user)
+
+    def editable_by(self, user):
+        """Tasks the user owns or can edit through a shared plan."""
+        return self.filter(
+            access__user=user,
+            access__permission__in=(TaskAccess.PERMISSION_OWNER, TaskAccess.PERMISSION_EDIT)
+        )
+
+    def in_window(self, user, start, end, tz):
+        """
+        Tasks visible to the user that are due in [start, end), by due date.
+
+        An all-day task covers its whole calendar day in ``tz``, so it is
+        included when that day overlaps the window. Owned and shared tasks
+        are found by separate queries joined with UNION ALL: an OR of the two
+        would stop the owned branch from being a range scan on the
+        (user, due_date) index. Shared tasks come in through the much smaller
+        TaskAccess subquery, which reads only the user's non-owner rows
+        (taskaccess_user_shared_idx).
+        """
+        first_day = start.astimezone(tz).date()
+        last_day = (end - timedelta(microseconds=1)).astimezone(tz).date()
+        day_start = datetime.combine(first_day, time.min, tzinfo=tz)
+        day_end = datetime.combine(last_day + timedelta(days=1), time.min, tzinfo=tz)
+        window = (
+            models.Q(is_all_day=False, due_date__gte=start, due_date__lt=end)
+            | models.Q(is_all_day=True, due_date__gte=day_start, due_date__lt=day_end)
+        )
+
+        owned = Task.objects.filter(window, user=user).order_by().values('pk')
+        shared = Task.objects.filter(
+            window,
+            pk__in=TaskAccess.objects.filter(user=user).exclude(
+                permission=TaskAccess.PERMISSION_OWNER
+            ).values('task_id')
+        ).order_by().values('pk')
+        return self.filter(pk__in=owned.union(shared, all=True)).order_by('due_date', 'id')
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    def get_queryset(self):
+        # The search vector is only ever read inside the database.
+        return super().get_queryset().defer('search_vector')
+
+class SharedPlanQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Plans the user owns or is a member of."""
+        owned = SharedPlan.objects.filter(owner=user).values('pk')
+        joined = SharedPlanMember.objects.filter(user=user).values('shared_plan')
+        return self.filter(pk__in=owned.union(joined, all=True))
+
+class StreakQuerySet(models.QuerySet):
+    def record_completion(self, user, date):
+        """
+        Count one completed task towards the user's streak day in a single
+        INSERT ... ON CONFLICT DO UPDATE, so concurrent completions never lose
+        an increment.
+        """
+        table = connection.ops.quote_name(Streak._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, date, tasks_completed, is_completed_day, updated_at)
+                VALUES (%s, %s, 1, %s, %s)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    tasks_completed = {table}.tasks_completed + 1,
+                    is_completed_day = EXCLUDED.is_completed_day,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                [user.pk, date, True, timezone.now()]
+            )
+        invalidate(Streak, user.pk)
+
+
+class StreakSummaryQuerySet(models.QuerySet):
+    def record_completion(self, user, date):
+        """
+        Fold one completed task on ``date`` into the user's summary. Call it
+        after Streak.objects.record_completion, in the same transaction; the
+        row lock serialises concurrent completions by the same user.
+
+        Returns the metrics from before the completion and the updated summary.
+        """
+        summary = self.select_for_update().filter(user=user).first()
+        if summary is None:
+            # First completion since the summaries were introduced: build it
+            # from the history, which already includes this completion.
+            (summary,) = self.rebuild([user.pk])
+            return StreakSummary(user=user).metrics(), summary
+        before = summary.metrics()
+        summary.add_completion(date)
+        summary.save()
+        return before, summary
+
+    def rebuild(self, user_ids):
+        """Recompute the summaries of ``user_ids`` from their Streak history."""
+        summaries = {user_id: StreakSummary(user_id=user_id) for user_id in user_ids}
+        days = (
+            Streak.objects.filter(user_id__in=user_ids, is_completed_day=True)
+            .order_by('user_id', 'date')
+            .values_list('user_id', 'date', 'tasks_completed')
+        )
+        for user_id, date, tasks_completed in days.iterator():
+            summaries[user_id].add_day(date, tasks_completed)
+        return self.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                'current_streak', 'longest_streak', 'last_active_date',
+                'total_active_days', 'total_tasks_completed', 'updated_at'
+            ]
+        )
 
 class Category(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
     color_hex = models.CharField(max_length=7, default='#90A4AE')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
         unique_together = ('user', 'name')
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='category_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
@@ -39,6 +201,34 @@ class Task(models.Model):
     categories = models.ManyToManyField(Category, through='TaskCategory')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted title + description tsvector for full-text search. On
+    # PostgreSQL a trigger (migration 0008) keeps it in sync on every insert
+    # and title/description update; it is GIN indexed there.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Serialized categories, so reads skip the TaskCategory join. TaskCategory
+    # stays the source of truth; see core.snapshots and core.signals.
+    category_snapshot = models.JSONField(default=list, editable=False)
+
+    objects = TaskManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='task_user_status_idx'),
+            models.Index(fields=['user', 'due_date'], name='task_user_due_date_idx'),
+            models.Index(fields=['user', '-updated_at', '-id'], name='task_user_updated_idx'),
+            models.Index(
+                fields=['user', 'due_date'],
+                name='task_user_pending_due_idx',
+                condition=models.Q(status='pending', due_date__isnull=False),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded owner so ownership changes can be detected on save.
+        instance._loaded_user_id = instance.__dict__.get('user_id')
+        return instance
 
     def __str__(self):
         return f"{self.title} ({self.user.username})"
@@ -74,19 +264,77 @@ class Streak(models.Model):
     date = models.DateField()
     tasks_completed = models.IntegerField(default=0)
     is_completed_day = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StreakQuerySet.as_manager()
 
     class Meta:
         unique_together = ('user', 'date')
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='streak_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.date}"
 
+class StreakSummary(models.Model):
+    """
+    Running totals over a user's Streak rows, so clients do not have to
+    download the whole history to show their streak.
+
+    ``current_streak`` is the run of consecutive active days ending on
+    ``last_active_date``; use current_streak_on() to find out whether that
+    run is still alive today.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='streak_summary')
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_active_date = models.DateField(null=True, blank=True)
+    total_active_days = models.PositiveIntegerField(default=0)
+    total_tasks_completed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    METRICS = ('total_tasks_completed', 'current_streak', 'longest_streak', 'total_active_days')
+
+    objects = StreakSummaryQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user.username} - {self.current_streak} day streak"
+
+    def metrics(self):
+        return {name: getattr(self, name) for name in self.METRICS}
+
+    def add_completion(self, date):
+        self.total_tasks_completed += 1
+        if self.last_active_date is None or date > self.last_active_date:
+            self.add_day(date, 0)
+
+    def add_day(self, date, tasks_completed):
+        """Count a new active day; days must be added in ascending order."""
+        if self.last_active_date is not None and date == self.last_active_date + timedelta(days=1):
+            self.current_streak += 1
+        else:
+            self.current_streak = 1
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        self.last_active_date = date
+        self.total_active_days += 1
+        self.total_tasks_completed += tasks_completed
+
+    def current_streak_on(self, date):
+        """The streak as seen on ``date``: it survives until the day after the last active one."""
+        if self.last_active_date is None or self.last_active_date < date - timedelta(days=1):
+            return 0
+        return self.current_streak
+
 class SharedPlan(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_plans')
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     members = models.ManyToManyField(User, through='SharedPlanMember', related_name='shared_plans')
 
+    objects = SharedPlanQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} (Owner: {self.owner.username})"
 
@@ -100,9 +348,14 @@ class SharedPlanMember(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     permission = models.CharField(max_length=10, choices=PERMISSION_CHOICES, default='view')
     invited_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('shared_plan', 'user')
+        indexes = [
+            models.Index(fields=['user', 'shared_plan'], name='planmember_user_plan_idx'),
+            models.Index(fields=['user', 'updated_at'], name='planmember_user_updated_idx'),
+        ]
 
 class SharedPlanTask(models.Model):
     shared_plan = models.ForeignKey(SharedPlan, on_delete=models.CASCADE)
@@ -112,6 +365,69 @@ class SharedPlanTask(models.Model):
     class Meta:
         unique_together = ('shared_plan', 'task')
 
+class TaskAccess(models.Model):
+    """
+    Denormalized (user, task, permission) rows derived from task ownership and
+    shared plan membership. Kept in sync by core.signals; rebuild with the
+    rebuild_task_access management command.
+    """
+    PERMISSION_VIEW = 'view'
+    PERMISSION_EDIT = 'edit'
+    PERMISSION_OWNER = 'owner'
+    PERMISSION_CHOICES = [
+        (PERMISSION_VIEW, 'View'),
+        (PERMISSION_EDIT, 'Edit'),
+        (PERMISSION_OWNER, 'Owner'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='access')
+    permission = models.CharField(max_length=10, choices=PERMISSION_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Task Access"
+        unique_together = ('user', 'task')
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='taskaccess_user_updated_idx'),
+            # A user's tasks shared by others, without their (far more
+            # numerous) owner rows; see TaskQuerySet.in_window.
+            models.Index(
+                fields=['user', 'task'], condition=~models.Q(permission='owner'),
+                name='taskaccess_user_shared_idx',
+            ),
+        ]
+
+class Tombstone(models.Model):
+    """
+    Marks a row that disappeared from a user's view so delta sync clients can
+    drop their local copy. There is no FK constraint on the user because
+    tombstones are written while a deleted user's rows are cascaded away.
+    """
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('category', 'Category'),
+        ('membership', 'Shared Plan Membership'),
+        ('streak', 'Streak'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+class CalendarSyncQuerySet(models.QuerySet):
+    def due(self, interval):
+        """Accounts never synced, or last synced more than ``interval`` ago."""
+        return self.filter(
+            models.Q(synced_at__isnull=True) | models.Q(synced_at__lt=timezone.now() - interval)
+        )
+
 class CalendarSync(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     provider = models.CharField(max_length=50)
@@ -119,6 +435,25 @@ class CalendarSync(models.Model):
     access_token = models.TextField()
     refresh_token = models.TextField(null=True, blank=True)
     synced_at = models.DateTimeField(null=True, blank=True)
+    # The provider's cursor for incremental fetches; empty means a full sync.
+    sync_token = models.CharField(max_length=255, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    # Set while a sync runs, so no other process syncs the account at the same time.
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    objects = CalendarSyncQuerySet.as_manager()
 
     class Meta:
         unique_together = ('user', 'provider')
+        indexes = [
+            models.Index(fields=['synced_at'], name='calendarsync_synced_idx'),
+        ]
+
+class CalendarSyncTask(models.Model):
+    """Links a task to the provider item it was synced from."""
+    calendar_sync = models.ForeignKey(CalendarSync, on_delete=models.CASCADE, related_name='links')
+    external_id = models.CharField(max_length=255)
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, related_name='calendar_link')
+
+    class Meta:
+        unique_together = ('calendar_sync', 'external_id')
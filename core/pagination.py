@@ -0,0 +1,188 @@
+import json
+from base64 import b64decode
+from urllib import parse
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on every ordering key instead of only the
+    first one.
+
+    DRF's CursorPagination filters on the leading ordering field and falls
+    back to an OFFSET for ties. Here the cursor stores the full key tuple of
+    the boundary row, so every page is a single index range scan. The last
+    ordering field must be unique (usually the primary key) so that positions
+    never collide.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        # Fetch one extra item to find out whether another page follows.
+        return self.build_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of paginate_queryset for native async views."""
+        queryset = self.prepare_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.build_page([obj async for obj in queryset[:self.page_size + 1]])
+
+    def prepare_queryset(self, queryset, request, view=None):
+        """Order the queryset and seek past the cursor position, without running it."""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (self._reverse, self._current_position) = (False, None)
+        else:
+            (_, self._reverse, self._current_position) = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if self._reverse else self.ordering
+        # Pin NULL placement to PostgreSQL's defaults (last ascending, first
+        # descending) so the seek filter below agrees on every backend.
+        queryset = queryset.order_by(*[
+            F(order[1:]).desc(nulls_first=True) if order.startswith('-') else F(order).asc(nulls_last=True)
+            for order in ordering
+        ])
+
+        if self._current_position is not None:
+            queryset = queryset.filter(
+                self._seek_filter(ordering, self._current_position, queryset.model)
+            )
+        return queryset
+
+    def build_page(self, results):
+        """Turn the fetched rows (page size + 1) into the page and its links."""
+        reverse, current_position = self._reverse, self._current_position
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _seek_filter(self, ordering, position, model):
+        """
+        Build the row-value comparison ``(a, b, c) > (x, y, z)`` as nested
+        ``OR``/``AND`` clauses, honouring each key's direction and where NULLs
+        sort for nullable keys.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q(pk__in=[])
+        equal_prefix = Q()
+        for order, value in zip(ordering, values):
+            field = order.lstrip('-')
+            descending = order.startswith('-')
+            if value is None:
+                # NULLs come first descending, so every non-NULL follows them;
+                # ascending they come last and only NULLs follow.
+                if descending:
+                    condition |= equal_prefix & Q(**{field + '__isnull': False})
+                equal_prefix &= Q(**{field + '__isnull': True})
+                continue
+
+            after = Q(**{field + ('__lt' if descending else '__gt'): value})
+            if not descending and _is_nullable(model, field):
+                after |= Q(**{field + '__isnull': True})
+            condition |= equal_prefix & after
+            equal_prefix &= Q(**{field: value})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('utf-8')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            position = tokens.get('p', [None])[0]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        # Positions are unique, so the offset DRF tracks is always zero.
+        return super().encode_cursor(Cursor(offset=0, reverse=cursor.reverse, position=cursor.position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            values.append(None if attr is None else str(attr))
+        return json.dumps(values)
+
+
+class TaskPagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
+
+
+class StreakPagination(KeysetPagination):
+    # (user, date) is unique, so the date alone is a stable key per user.
+    ordering = ('-date',)
+
+
+def _is_nullable(model, name):
+    try:
+        return model._meta.get_field(name).null
+    except FieldDoesNotExist:
+        # Annotations such as a search rank.
+        return False
+
+
+def _reverse_ordering(ordering_tuple):
+    def invert(x):
+        return x[1:] if x.startswith('-') else '-' + x
+
+    return tuple([invert(item) for item in ordering_tuple])
@@ -0,0 +1,137 @@
+"""
+EXPLAIN checks for the list querysets of the main viewsets (PostgreSQL only).
+
+Each viewset's first page (and the agenda's window query) is explained with
+the planner's normal costs, on data seeded at a realistic spread over many
+users, and must use an index of the expected table whose leading columns are
+the expected ones. A missing or unusable index shows up as a plan without it.
+"""
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from . import views
+from .access import sync_task_access
+from .models import (
+    Badge, Category, SharedPlan, SharedPlanMember, SharedPlanTask, Streak, Task, TaskAccess, UserBadge
+)
+
+User = get_user_model()
+
+# (viewset, model, leading index columns its list query must be served by)
+PLAN_EXPECTATIONS = (
+    (views.TaskViewSet, TaskAccess, ('user_id',)),
+    (views.CategoryViewSet, Category, ('user_id',)),
+    (views.StreakViewSet, Streak, ('user_id', 'date')),
+    (views.UserBadgeViewSet, UserBadge, ('user_id',)),
+    (views.SharedPlanViewSet, SharedPlanMember, ('user_id',)),
+    (views.SharedPlanTaskViewSet, SharedPlanMember, ('user_id',)),
+)
+
+
+
+def agenda_queryset(user):
+    start = timezone.now()
+    return Task.objects.in_window(user, start, start + timedelta(days=7), dt_timezone.utc)
+
+
+# (name, function of the user returning the queryset, model, leading index columns)
+QUERYSET_EXPECTATIONS = (
+    ('TaskViewSet.agenda', agenda_queryset, Task, ('user_id', 'due_date')),
+)
+
+
+def index_names(model, columns):
+    """Names of the indexes (unique constraints included) on ``model`` that lead with ``columns``."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return {
+        name for name, info in constraints.items()
+        if (info['index'] or info['unique']) and not info['primary_key']
+        and info['columns'][:len(columns)] == list(columns)
+    }
+
+
+def explain_list(viewset, user):
+    request = Request(RequestFactory().get('/'))
+    request.user = user
+    view = viewset(request=request, format_kwarg=None, kwargs={}, action='list')
+    queryset = view.get_queryset()
+    paginator = view.paginator
+    if paginator is not None:
+        queryset = queryset.order_by(*paginator.ordering)[:paginator.page_size]
+    return queryset.explain()
+
+
+def check_plans(user):
+    """Return ``(name, plan, expected index names, ok)`` for every expectation."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    results = []
+    for viewset, model, columns in PLAN_EXPECTATIONS:
+        plan = explain_list(viewset, user)
+        expected = index_names(model, columns)
+        results.append((viewset.__name__, plan, expected, any(name in plan for name in expected)))
+    for label, get_queryset, model, columns in QUERYSET_EXPECTATIONS:
+        plan = get_queryset(user).explain()
+        expected = index_names(model, columns)
+        results.append((label, plan, expected, any(name in plan for name in expected)))
+    return results
+
+
+def seed(users=200, tasks_per_user=100, members_per_plan=20):
+    """
+    Seed ``users`` users with tasks, categories, streaks, badges and shared
+    plans, plus their TaskAccess rows, and return one of them. Run it inside
+    a transaction that is rolled back.
+    """
+    stamp = timezone.now().timestamp()
+    people = User.objects.bulk_create(
+        User(username=f'plan-check-{stamp}-{i}') for i in range(users)
+    )
+    now = timezone.now()
+    tasks = Task.objects.bulk_create(
+        Task(
+            user=person,
+            title=f'Task {i}',
+            status='pending' if i % 3 else 'completed',
+            due_date=now + timedelta(days=i % 60),
+        )
+        for person in people for i in range(tasks_per_user)
+    )
+    Category.objects.bulk_create(
+        Category(user=person, name=f'Category {i}') for person in people for i in range(10)
+    )
+    Streak.objects.bulk_create(
+        Streak(user=person, date=date.today() - timedelta(days=i), tasks_completed=1)
+        for person in people for i in range(100)
+    )
+    badges = Badge.objects.bulk_create(
+        Badge(code=f'plan-check-{stamp}-{i}', name='Badge', description='', icon_url='') for i in range(50)
+    )
+    UserBadge.objects.bulk_create(
+        UserBadge(user=person, badge=badge) for person in people for badge in badges[:25]
+    )
+
+    plans = SharedPlan.objects.bulk_create(
+        SharedPlan(owner=person, name=f'Plan {i}') for i, person in enumerate(people)
+    )
+    SharedPlanMember.objects.bulk_create(
+        SharedPlanMember(shared_plan=plan, user=people[(i + offset) % users])
+        for i, plan in enumerate(plans) for offset in range(1, members_per_plan + 1)
+    )
+    SharedPlanTask.objects.bulk_create(
+        SharedPlanTask(shared_plan=plan, task=task)
+        for i, plan in enumerate(plans)
+        for task in tasks[i * tasks_per_user:i * tasks_per_user + 10]
+    )
+    # bulk_create skips the signals that maintain TaskAccess; without these
+    # rows the task querysets would describe empty result sets.
+    task_ids = [task.pk for task in tasks]
+    for start in range(0, len(task_ids), 1000):
+        sync_task_access(task_ids[start:start + 1000])
+    return people[0]
@@ -0,0 +1,99 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'db-pin:{scope}'
+
+# Whether reads in the current request may be served by a replica. Off unless
+# a view opts in, so anything not explicitly marked reads from the primary.
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_primary(user_id=None):
+    """
+    Send the user's reads (everyone's, without a user) to the primary until
+    the replicas have had time to catch up with a write.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(PIN_KEY.format(scope=user_id or '*'), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(cache.get_many([PIN_KEY.format(scope=user_id), PIN_KEY.format(scope='*')]))
+
+
+async def ais_pinned(user_id):
+    return bool(await cache.aget_many([PIN_KEY.format(scope=user_id), PIN_KEY.format(scope='*')]))
+
+
+class ReplicaRouter:
+    """
+    Route reads to a random replica from DATABASE_REPLICAS while replica
+    reads are enabled for the request; everything else uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from either may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadMixin:
+    """
+    Serve ``replica_actions`` from a read replica, unless the user wrote
+    recently (see PrimaryPinningMiddleware), so they always read their own
+    writes.
+    """
+    replica_actions = ('list',)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Authentication and permission checks run before initial() decides.
+        with replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and self.action in self.replica_actions
+            and not is_pinned(request.user.pk)
+        ):
+            _replica_reads.set(True)
+
+
+class PrimaryPinningMiddleware:
+    """Pin the user to the primary after any successful write request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_primary(user.pk)
+        return response
@@ -1,12 +1,72 @@
+from collections import defaultdict
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
 from .models import (
     Category, Task, TaskCategory, Badge, UserBadge,
-    Streak, SharedPlan, SharedPlanMember, SharedPlanTask,
+    Streak, StreakSummary, SharedPlan, SharedPlanMember, SharedPlanTask,
     CalendarSync
 )
 
+def get_requested_fields(request):
+    """Return the field names listed in ``?fields=`` for a read request, or None."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(',') if name.strip()]
+
+class SparseFieldsetMixin:
+    """Limit the top-level output to the fields requested with ``?fields=``."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+
+        requested = get_requested_fields(self.context.get('request'))
+        if requested is None:
+            return fields
+
+        unknown = [name for name in requested if name not in fields]
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': f'Unknown field(s): {", ".join(unknown)}'}
+            )
+        return {name: field for name, field in fields.items() if name in requested}
+
+class EagerLoadingMixin:
+    """
+    Declare the related rows a serializer reads, per output field:
+
+        select_related_fields = {'owner': ('owner',)}
+        prefetch_related_fields = {'members': (Prefetch(...),)}
+
+    Views apply them with setup_eager_loading(), limited to the fields the
+    request asked for, so a list costs the same number of queries however
+    many rows it has.
+    """
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        for name, lookups in cls.select_related_fields.items():
+            if fields is None or name in fields:
+                queryset = queryset.select_related(*lookups)
+        for name, lookups in cls.prefetch_related_fields.items():
+            if fields is None or name in fields:
+                queryset = queryset.prefetch_related(*lookups)
+        return queryset
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -35,18 +95,82 @@ class AuthTokenSerializer(serializers.Serializer):
         attrs['user'] = user
         return attrs
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ('id', 'name', 'color_hex', 'created_at')
-        read_only_fields = ('id', 'created_at')
+        fields = ('id', 'name', 'color_hex', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'created_at', 'updated_at')
 
-class TaskSerializer(serializers.ModelSerializer):
-    categories = CategorySerializer(many=True, read_only=True)
+def _descendants_cte(root_count):
+    """SQL for a recursive CTE ``tree(id)`` over every descendant of the given root ids."""
+    table = Task._meta.db_table
+    placeholders = ', '.join(['%s'] * root_count)
+    return f"""
+        WITH RECURSIVE tree(id) AS (
+            SELECT id FROM {table} WHERE parent_task_id IN ({placeholders})
+            UNION
+            SELECT child.id FROM {table} child
+            INNER JOIN tree ON child.parent_task_id = tree.id
+        )
+    """
+
+def load_subtask_index(tasks):
+    """Fetch every descendant of the given tasks and group them by parent id.
+
+    The whole forest is loaded with one recursive CTE, so the cost does not
+    depend on how deep or wide the trees are.
+    """
+    root_ids = list(dict.fromkeys(task.pk for task in tasks))
+    index = defaultdict(list)
+    if not root_ids:
+        return index
+
+    table = Task._meta.db_table
+    # Everything but the search vector, which the serializers never read.
+    columns = ', '.join(
+        connection.ops.quote_name(field.column)
+        for field in Task._meta.concrete_fields if field.name != 'search_vector'
+    )
+    descendants = list(Task.objects.raw(
+        _descendants_cte(len(root_ids)) +
+        f"SELECT {columns} FROM {table} WHERE id IN (SELECT id FROM tree) ORDER BY id",
+        root_ids
+    ))
+    for task in descendants:
+        index[task.parent_task_id].append(task)
+    return index
+
+def subtree_watermark(task_id):
+    """Return (count, max updated_at) over every descendant of a task, in one query."""
+    table = Task._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _descendants_cte(1) +
+            f"SELECT COUNT(*), MAX(updated_at) FROM {table} WHERE id IN (SELECT id FROM tree)",
+            [task_id]
+        )
+        return cursor.fetchone()
+
+class TaskListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Load the subtask forest once for the whole list instead of
+        # letting every task query its own children.
+        if (self.root is self and 'subtask_index' not in self.context
+                and 'subtasks' in self.child.fields):
+            data = list(data.all() if hasattr(data, 'all') else data)
+            self.context['subtask_index'] = load_subtask_index(data)
+        return super().to_representation(data)
+
+class TaskSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    # Rendered from the denormalized snapshot, which holds CategorySerializer
+    # output, so categories cost no query. Subtasks come from the subtask
+    # index (see TaskListSerializer).
+    categories = serializers.JSONField(source='category_snapshot', read_only=True)
     subtasks = serializers.SerializerMethodField()
 
     class Meta:
         model = Task
+        list_serializer_class = TaskListSerializer
         fields = (
             'id', 'title', 'description', 'due_date', 'is_all_day',
             'priority', 'status', 'parent_task', 'categories',
@@ -54,35 +178,83 @@ class TaskSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    def to_representation(self, instance):
+        # A task serialized on its own loads its whole subtree up front; lists
+        # do the same for all their tasks in TaskListSerializer.
+        if (self.root is self and 'subtask_index' not in self.context
+                and 'subtasks' in self.fields):
+            self.context['subtask_index'] = load_subtask_index([instance])
+        return super().to_representation(instance)
+
     def get_subtasks(self, obj):
-        subtasks = Task.objects.filter(parent_task=obj)
-        return TaskSerializer(subtasks, many=True).data
+        index = self.context.get('subtask_index')
+        if index is None:
+            subtasks = Task.objects.filter(parent_task=obj)
+            context = dict(self.context)
+        else:
+            subtasks = index.get(obj.pk, [])
+            context = self.context
+        return TaskSerializer(subtasks, many=True, context=context).data
 
-class TaskCategorySerializer(serializers.ModelSerializer):
+class SyncTaskSerializer(TaskSerializer):
+    # Delta sync ships a flat task list, so nesting subtasks would only repeat rows.
+    subtasks = None
+
+    class Meta(TaskSerializer.Meta):
+        fields = tuple(name for name in TaskSerializer.Meta.fields if name != 'subtasks')
+
+class TaskBulkOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=('create', 'update', 'delete'))
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+    categories = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'This field is required for update and delete.'})
+        return attrs
+
+class TaskCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = TaskCategory
         fields = ('id', 'task', 'category', 'created_at')
         read_only_fields = ('id', 'created_at')
 
-class BadgeSerializer(serializers.ModelSerializer):
+class BadgeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Badge
         fields = ('id', 'code', 'name', 'description', 'icon_url')
         read_only_fields = ('id',)
 
-class UserBadgeSerializer(serializers.ModelSerializer):
+class UserBadgeSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     badge = BadgeSerializer(read_only=True)
 
+    select_related_fields = {'badge': ('badge',)}
+
     class Meta:
         model = UserBadge
         fields = ('id', 'badge', 'awarded_at')
         read_only_fields = ('id', 'awarded_at')
 
-class StreakSerializer(serializers.ModelSerializer):
+class StreakSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Streak
-        fields = ('id', 'date', 'tasks_completed', 'is_completed_day')
-        read_only_fields = ('id',)
+        fields = ('id', 'date', 'tasks_completed', 'is_completed_day', 'updated_at')
+        read_only_fields = ('id', 'updated_at')
+
+class StreakSummarySerializer(serializers.ModelSerializer):
+    current_streak = serializers.SerializerMethodField()
+
+    class Meta:
+        model = StreakSummary
+        fields = (
+            'current_streak', 'longest_streak', 'last_active_date',
+            'total_active_days', 'total_tasks_completed'
+        )
+        read_only_fields = fields
+
+    def get_current_streak(self, obj):
+        return obj.current_streak_on(timezone.now().date())
 
 class SharedPlanMemberSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -92,25 +264,58 @@ class SharedPlanMemberSerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'permission', 'invited_at')
         read_only_fields = ('id', 'invited_at')
 
-class SharedPlanSerializer(serializers.ModelSerializer):
+class SharedPlanMembershipSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SharedPlanMember
+        fields = ('id', 'shared_plan', 'permission', 'invited_at', 'updated_at')
+        read_only_fields = fields
+
+class SharedPlanSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     members = SharedPlanMemberSerializer(source='sharedplanmember_set', many=True, read_only=True)
 
+    select_related_fields = {'owner': ('owner',)}
+    prefetch_related_fields = {
+        'members': (
+            Prefetch('sharedplanmember_set', queryset=SharedPlanMember.objects.select_related('user')),
+        ),
+    }
+
     class Meta:
         model = SharedPlan
         fields = ('id', 'name', 'owner', 'members', 'created_at')
         read_only_fields = ('id', 'created_at')
 
-class SharedPlanTaskSerializer(serializers.ModelSerializer):
+class SharedPlanTaskListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # One subtask index for every nested task, as TaskListSerializer does.
+        if (self.root is self and 'subtask_index' not in self.context
+                and 'task' in self.child.fields):
+            data = list(data.all() if hasattr(data, 'all') else data)
+            self.context['subtask_index'] = load_subtask_index([item.task for item in data])
+        return super().to_representation(data)
+
+class SharedPlanTaskSerializer(EagerLoadingMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     task = TaskSerializer(read_only=True)
 
+    # A prefetch rather than a join, so the task's default manager (which
+    # defers the search vector) applies.
+    prefetch_related_fields = {'task': (Prefetch('task', queryset=Task.objects.all()),)}
+
     class Meta:
         model = SharedPlanTask
+        list_serializer_class = SharedPlanTaskListSerializer
         fields = ('id', 'task', 'created_at')
         read_only_fields = ('id', 'created_at')
 
-class CalendarSyncSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        if (self.root is self and 'subtask_index' not in self.context
+                and 'task' in self.fields):
+            self.context['subtask_index'] = load_subtask_index([instance.task])
+        return super().to_representation(instance)
+
+class CalendarSyncSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CalendarSync
-        fields = ('id', 'provider', 'provider_user_id', 'synced_at')
-        read_only_fields = ('id', 'synced_at') 
\ No newline at end of file
+        fields = ('id', 'provider', 'provider_user_id', 'synced_at', 'last_error')
+        read_only_fields = ('id', 'synced_at', 'last_error')
@@ -0,0 +1,117 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .access import sync_task_access
+from .authentication import USER_STATUS_KEY
+from .cache import invalidate, user_row_cache
+from .snapshots import refresh_category_snapshots
+from .models import (
+    LazyUser, Task, TaskAccess, TaskCategory, Category, Streak, Badge, UserBadge,
+    SharedPlanMember, SharedPlanTask, Tombstone
+)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        TaskAccess.objects.get_or_create(
+            user_id=instance.user_id,
+            task=instance,
+            defaults={'permission': TaskAccess.PERMISSION_OWNER}
+        )
+    elif instance.user_id != getattr(instance, '_loaded_user_id', instance.user_id):
+        transaction.on_commit(partial(sync_task_access, [instance.pk]))
+    instance._loaded_user_id = instance.user_id
+
+
+@receiver(post_save, sender=SharedPlanTask)
+@receiver(post_delete, sender=SharedPlanTask)
+def shared_plan_task_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Deferred to commit so cascading deletes of the task itself have finished.
+    transaction.on_commit(partial(sync_task_access, [instance.task_id]))
+
+
+@receiver(post_save, sender=SharedPlanMember)
+@receiver(post_delete, sender=SharedPlanMember)
+def shared_plan_member_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    def sync():
+        task_ids = SharedPlanTask.objects.filter(
+            shared_plan_id=instance.shared_plan_id
+        ).values_list('task_id', flat=True)
+        sync_task_access(task_ids, user_ids=[instance.user_id])
+
+    transaction.on_commit(sync)
+
+
+@receiver(post_delete, sender=TaskAccess)
+def task_access_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(user_id=instance.user_id, kind='task', object_id=instance.task_id)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(user_id=instance.user_id, kind='category', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=SharedPlanMember)
+def membership_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(user_id=instance.user_id, kind='membership', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Streak)
+def streak_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(user_id=instance.user_id, kind='streak', object_id=instance.pk)
+
+
+@receiver(post_save, sender=TaskCategory)
+@receiver(post_delete, sender=TaskCategory)
+def task_category_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Categories are part of the task payload, so a link change is a task change.
+    refresh_category_snapshots([instance.task_id], touch=True)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    # Deleting a category is covered by the cascaded TaskCategory deletes. A
+    # rename changes the payload of every task carrying it, shared ones
+    # included, so their updated_at moves too.
+    refresh_category_snapshots(
+        TaskCategory.objects.filter(category=instance).values_list('task_id', flat=True), touch=True
+    )
+
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+@receiver(post_save, sender=UserBadge)
+@receiver(post_delete, sender=UserBadge)
+@receiver(post_save, sender=Streak)
+@receiver(post_delete, sender=Streak)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def cached_model_changed(sender, instance, **kwargs):
+    invalidate(sender, getattr(instance, 'user_id', None))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=LazyUser)
+@receiver(post_delete, sender=LazyUser)
+def user_changed(sender, instance, **kwargs):
+    user_row_cache.delete(instance.pk)
+    cache.delete(USER_STATUS_KEY.format(pk=instance.pk))
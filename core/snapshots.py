@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import Task, TaskCategory
+from .serializers import CategorySerializer
+
+
+def refresh_category_snapshots(task_ids, batch_size=500, touch=False):
+    """
+    Rebuild Task.category_snapshot for the given tasks from their TaskCategory
+    links, which stay the source of truth. Each batch costs two queries.
+
+    With ``touch`` the tasks' updated_at is bumped in the same update, so
+    ETags and delta sync see the changed payload; repairs leave it alone.
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    fields = ['category_snapshot', 'updated_at'] if touch else ['category_snapshot']
+    now = timezone.now()
+    for start in range(0, len(task_ids), batch_size):
+        batch = task_ids[start:start + batch_size]
+        categories = defaultdict(list)
+        links = TaskCategory.objects.filter(task_id__in=batch).select_related('category').order_by('category_id')
+        for link in links:
+            categories[link.task_id].append(link.category)
+        Task.objects.bulk_update(
+            [
+                Task(
+                    pk=task_id,
+                    category_snapshot=CategorySerializer(categories[task_id], many=True).data,
+                    updated_at=now
+                )
+                for task_id in batch
+            ],
+            fields
+        )
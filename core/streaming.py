@@ -0,0 +1,45 @@
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iter_chunks(queryset, chunk_size):
+    """Yield lists of up to ``chunk_size`` objects without loading the whole queryset."""
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json_array(chunks):
+    """Encode an iterable of lists of items as one JSON array, a chunk at a time."""
+    yield '['
+    separator = ''
+    for items in chunks:
+        if not items:
+            continue
+        yield separator + json.dumps(items, cls=JSONEncoder)[1:-1]
+        separator = ','
+    yield ']'
+
+
+def stream_json_object(sections):
+    """Encode ``(key, chunks)`` pairs as one JSON object of streamed arrays."""
+    yield '{'
+    separator = ''
+    for key, chunks in sections:
+        yield separator + json.dumps(key) + ':'
+        yield from stream_json_array(chunks)
+        separator = ','
+    yield '}'
+
+
+def stream_ndjson(chunks):
+    """Encode an iterable of lists of items as newline-delimited JSON, a chunk at a time."""
+    for items in chunks:
+        if items:
+            yield ''.join(json.dumps(item, cls=JSONEncoder) + '\n' for item in items)
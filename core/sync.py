@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task, Category, Streak, SharedPlanMember, Tombstone
+
+# Rows committed slightly after the watermark was taken may carry an older
+# updated_at, so every delta re-sends this window; clients upsert by id.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# Tombstones older than this are pruned; older tokens get a full resync.
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+TOKEN_SALT = 'core.sync'
+
+
+def make_sync_token(watermark):
+    return signing.dumps(watermark.isoformat(), salt=TOKEN_SALT)
+
+
+def read_sync_token(token):
+    """Return the watermark stored in a token, raising signing.BadSignature if it was tampered with."""
+    try:
+        return datetime.fromisoformat(signing.loads(token, salt=TOKEN_SALT))
+    except (TypeError, ValueError):
+        raise signing.BadSignature('Malformed sync token.')
+
+
+def collect_changes(user, since):
+    """
+    Gather the querysets of everything visible to the user that changed after
+    ``since``, plus the ids of rows removed from their view. With ``since`` set
+    to None everything is returned and there are no tombstones.
+    """
+    if since is None:
+        return {
+            'tasks': Task.objects.visible_to(user),
+            'categories': Category.objects.filter(user=user),
+            'memberships': SharedPlanMember.objects.filter(user=user),
+            'streaks': Streak.objects.filter(user=user),
+            'deleted': {},
+        }
+
+    since = since - SYNC_OVERLAP
+    # Both conditions sit in one filter() call so they share the access join;
+    # a task also counts as changed when it was newly shared with the user.
+    tasks = Task.objects.filter(
+        Q(access__user=user) &
+        (Q(updated_at__gt=since) | Q(access__updated_at__gt=since))
+    )
+    deleted = {}
+    tombstones = Tombstone.objects.filter(user=user, deleted_at__gt=since).values_list('kind', 'object_id')
+    for kind, object_id in tombstones:
+        deleted.setdefault(kind, []).append(object_id)
+
+    return {
+        'tasks': tasks,
+        'categories': Category.objects.filter(user=user, updated_at__gt=since),
+        'memberships': SharedPlanMember.objects.filter(user=user, updated_at__gt=since),
+        'streaks': Streak.objects.filter(user=user, updated_at__gt=since),
+        'deleted': deleted,
+    }
+
+
+def is_token_expired(since):
+    return since < timezone.now() - TOMBSTONE_RETENTION
@@ -1,3 +1,612 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import async_views
+
+from .cache import cache_scope, get_version, invalidate
+from .calendar_sync import FakeCalendarProvider, RetryableProviderError, lock_account, sync_account
+from .checks import check_hashing_slots_are_shared, check_replica_pins_are_shared
+from .hashers import SLOTS_KEY, WAITING_KEY
+from .management.commands import check_query_budgets
+from .models import (
+    CalendarSync, Category, SharedPlan, SharedPlanMember, SharedPlanTask, Streak, StreakSummary, Task, TaskAccess, TaskCategory, Tombstone
+)
+from .query_plans import check_plans, index_names, seed
+
+
+class TaskTreeQueryTests(TestCase):
+    """Task list and retrieve cost the same number of queries whatever the subtree shape."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('tree-owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def build_tree(self, depth, width):
+        root = Task.objects.create(user=self.user, title='root')
+        level = [root]
+        for d in range(depth):
+            level = [
+                Task.objects.create(user=self.user, title=f'task {d}-{i}', parent_task=parent)
+                for parent in level for i in range(width)
+            ]
+        return root
+
+    def assert_tree_queries(self, root):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/tasks/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/tasks/{root.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_shallow_tree(self):
+        root = self.build_tree(depth=1, width=2)
+        data = self.assert_tree_queries(root)
+        self.assertEqual(len(data['subtasks']), 2)
+
+    def test_deep_and_wide_tree(self):
+        root = self.build_tree(depth=4, width=3)
+        data = self.assert_tree_queries(root)
+        node, depth = data, 0
+        while node['subtasks']:
+            self.assertEqual(len(node['subtasks']), 3)
+            node, depth = node['subtasks'][0], depth + 1
+        self.assertEqual(depth, 4)
+
+
+class TaskAccessRebuildTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('access-owner')
+        self.member = User.objects.create_user('access-member')
+        # Access rows for shared plans are synced on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = SharedPlan.objects.create(owner=self.owner, name='Plan')
+            self.membership = SharedPlanMember.objects.create(shared_plan=plan, user=self.member)
+            self.tasks = [Task.objects.create(user=self.owner, title=f'task {i}') for i in range(20)]
+            for task in self.tasks:
+                SharedPlanTask.objects.create(shared_plan=plan, task=task)
+
+    def test_rebuild_from_scratch_only_tombstones_lost_access(self):
+        self.assertEqual(TaskAccess.objects.count(), 40)
+        tombstones = Tombstone.objects.count()
+        call_command('rebuild_task_access', from_scratch=True, chunk_size=7, stdout=StringIO())
+        self.assertEqual(TaskAccess.objects.count(), 40)
+        self.assertEqual(Tombstone.objects.count(), tombstones)
+
+        # Drop the membership row without its signals: the rebuild revokes it.
+        SharedPlanMember.objects.filter(pk=self.membership.pk)._raw_delete('default')
+        call_command('rebuild_task_access', from_scratch=True, stdout=StringIO())
+        self.assertEqual(TaskAccess.objects.count(), 20)
+        self.assertEqual(
+            Tombstone.objects.filter(user=self.member, kind='task').count(), tombstones + 20
+        )
+
+    def test_sync_does_not_report_visible_tasks_as_deleted(self):
+        client = APIClient()
+        client.force_authenticate(self.member)
+        token = client.get('/api/sync/').data['token']
+        task = self.tasks[0]
+        TaskAccess.objects.filter(user=self.member, task=task).delete()
+        TaskAccess.objects.create(user=self.member, task=task, permission=TaskAccess.PERMISSION_VIEW)
+
+        data = client.get('/api/sync/', {'since': token}).data
+        self.assertIn(task.pk, [item['id'] for item in data['tasks']])
+        self.assertNotIn(task.pk, data['deleted'].get('task', []))
+
+
+class ConcurrentCompletionTests(TransactionTestCase):
+    """Completing tasks from many threads counts each task exactly once."""
+    workers = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache memory databases fail concurrent writers instead of waiting.
+            self.skipTest('Needs a database that lets concurrent writers wait.')
+        self.user = User.objects.create_user('completer')
+
+    def complete(self, task_id):
+        try:
+            client = APIClient()
+            client.force_authenticate(self.user)
+            return client.post(f'/api/tasks/{task_id}/complete/').status_code
+        finally:
+            connection.close()
+
+    def complete_concurrently(self, task_ids):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            statuses = list(executor.map(self.complete, task_ids))
+        self.assertEqual(statuses, [200] * len(task_ids))
+
+    def assert_counted(self, completed):
+        streak = Streak.objects.get(user=self.user, date=timezone.now().date())
+        self.assertEqual(streak.tasks_completed, completed)
+        summary = StreakSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_tasks_completed, completed)
+        self.assertEqual(summary.total_active_days, 1)
+        self.assertEqual(summary.longest_streak, 1)
+        self.assertEqual(summary.last_active_date, streak.date)
+
+    def test_same_task_counts_once(self):
+        task = Task.objects.create(user=self.user, title='once')
+        self.complete_concurrently([task.pk] * self.workers)
+        self.assert_counted(1)
+
+    def test_different_tasks_all_count(self):
+        tasks = [Task.objects.create(user=self.user, title=f'task {i}') for i in range(self.workers)]
+        self.complete_concurrently([task.pk for task in tasks])
+        self.assert_counted(self.workers)
+
+        # Completing them again changes nothing.
+        self.complete_concurrently([task.pk for task in tasks])
+        self.assert_counted(self.workers)
+
+
+class CacheInvalidationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cached')
+        self.scope = cache_scope(Streak, self.user.pk)
+
+    def test_version_is_bumped_on_commit(self):
+        before = get_version(self.scope)
+        with self.captureOnCommitCallbacks(execute=True):
+            Streak.objects.record_completion(self.user, timezone.now().date())
+            # A read before the commit must not cache old rows under a new version.
+            self.assertEqual(get_version(self.scope), before)
+        self.assertNotEqual(get_version(self.scope), before)
+
+    def test_rolled_back_write_keeps_the_version(self):
+        before = get_version(self.scope)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                invalidate(Streak, self.user.pk)
+                transaction.set_rollback(True)
+        self.assertEqual(get_version(self.scope), before)
+
+
+class InactiveUserTests(TestCase):
+    """A deactivated user's access token stops working before it expires."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('leaver')
+        self.token = str(AccessToken.for_user(self.user))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+    def test_current_user_rejects_inactive_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = client.get('/api/auth/user/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_async_current_user_rejects_inactive_user(self):
+        request = AsyncRequestFactory().get('/api/auth/user/', headers={'Authorization': f'Bearer {self.token}'})
+        response = async_to_sync(async_views.current_user)(request)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content)['detail'], 'User is inactive')
+
+    def test_views_that_never_load_the_row_reject_inactive_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(client.get('/api/tasks/').status_code, 401)
+        self.assertEqual(client.post('/api/tasks/', {'title': 'late'}).status_code, 401)
+        request = AsyncRequestFactory().get('/api/tasks/', headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(async_to_sync(async_views.task_list)(request).status_code, 401)
+
+    def test_deactivation_and_deletion_apply_at_once(self):
+        user = User.objects.create_user('stayer')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        self.assertEqual(client.get('/api/categories/').status_code, 200)
+
+        user.is_active = False
+        user.save()
+        self.assertEqual(client.get('/api/categories/').status_code, 401)
+
+        user.delete()
+        self.assertEqual(client.get('/api/categories/').status_code, 401)
+        self.assertEqual(client.post('/api/categories/', {'name': 'orphan'}).status_code, 401)
+        self.assertFalse(Category.objects.filter(name='orphan').exists())
+
+
+class AsyncTaskViewTests(TestCase):
+    """The async task views answer like the DRF views they stand in for."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('async-reader')
+        self.token = f'Bearer {AccessToken.for_user(self.user)}'
+        self.task = Task.objects.create(user=self.user, title='parent')
+        Task.objects.create(user=self.user, title='child', parent_task=self.task)
+
+    def get(self, view, path, *args, **headers):
+        request = AsyncRequestFactory().get(path, headers={'Authorization': self.token, **headers})
+        return async_to_sync(view)(request, *args)
+
+    def test_task_detail_revalidates_with_the_drf_etag(self):
+        path = f'/api/tasks/{self.task.pk}/'
+        response = self.get(async_views.task_detail, path, self.task.pk)
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(response['ETag'], client.get(path)['ETag'])
+
+        response = self.get(async_views.task_detail, path, self.task.pk, **{'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_task_list_prunes_fields(self):
+        response = self.get(async_views.task_list, '/api/tasks/?fields=id,title')
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)['results']
+        self.assertEqual([set(task) for task in results], [{'id', 'title'}] * 2)
+
+        response = self.get(async_views.task_list, '/api/tasks/?fields=id,nope')
+        self.assertEqual(response.status_code, 400)
+
+
+class PasswordHashingLimitTests(TestCase):
+    """Every sign-in entry point answers 429 while the shared hashing slots are taken."""
+
+    def setUp(self):
+        User.objects.create_user('signer', password='correct horse battery')
+        # Any cache that is not per process counts as shared.
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        self.enterContext(override_settings(CACHES=shared))
+
+    def assert_busy(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=0, PASSWORD_HASH_QUEUE_SIZE=0)
+    def test_entry_points_answer_429(self):
+        credentials = {'username': 'signer', 'password': 'correct horse battery'}
+        self.assert_busy(APIClient().post('/api/auth/login/', credentials))
+        self.assert_busy(APIClient().post('/api-token-auth/', credentials))
+        self.assert_busy(self.client.post('/admin/login/', credentials))
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1)
+    def test_slots_are_released(self):
+        for _ in range(2):
+            response = APIClient().post('/api/auth/login/', {'username': 'signer', 'password': 'wrong'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(cache.get(SLOTS_KEY), 0)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_QUEUE_TIMEOUT=5)
+    def test_queued_sign_in_gets_a_freed_slot(self):
+        cache.set(SLOTS_KEY, 1)
+        threading.Timer(0.2, cache.decr, [SLOTS_KEY]).start()
+        response = APIClient().post('/api/auth/login/', {'username': 'signer', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(cache.get(WAITING_KEY), 0)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_QUEUE_TIMEOUT=0.2)
+    def test_queued_sign_in_times_out(self):
+        cache.set(SLOTS_KEY, 1)
+        self.assert_busy(APIClient().post('/api/auth/login/', {'username': 'signer', 'password': 'wrong'}))
+        self.assertEqual((cache.get(SLOTS_KEY), cache.get(WAITING_KEY)), (1, 0))
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_QUEUE_SIZE=1)
+    def test_full_queue_answers_at_once(self):
+        cache.set(SLOTS_KEY, 1)
+        cache.set(WAITING_KEY, 1)
+        started = time.monotonic()
+        self.assert_busy(APIClient().post('/api/auth/login/', {'username': 'signer', 'password': 'wrong'}))
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=0, PASSWORD_HASH_QUEUE_SIZE=0, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    })
+    def test_per_process_cache_limits_each_process(self):
+        self.assert_busy(APIClient().post('/api/auth/login/', {'username': 'signer', 'password': 'wrong'}))
+        self.assertEqual([warning.id for warning in check_hashing_slots_are_shared(None)], ['core.W001'])
+
+    def test_shared_cache_passes_the_check(self):
+        self.assertEqual(check_hashing_slots_are_shared(None), [])
+
+
+class ReplicaPinCheckTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['replica_0'])
+    def test_replicas_need_a_shared_cache(self):
+        errors = check_replica_pins_are_shared(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_replica_pins_are_shared(None), [])
+
+    def test_no_replicas_no_error(self):
+        self.assertEqual(check_replica_pins_are_shared(None), [])
+
+
+class AgendaWindowTests(TestCase):
+    """The agenda finds owned and shared tasks with range scans, however many tasks the user has."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('agenda-owner')
+        self.other = User.objects.create_user('agenda-sharer')
+        self.start = datetime(2030, 1, 10, tzinfo=dt_timezone.utc)
+        self.end = self.start + timedelta(days=7)
+
+    def in_window(self):
+        return Task.objects.in_window(self.user, self.start, self.end, dt_timezone.utc)
+
+    def test_owned_and_shared_tasks_in_window(self):
+        inside = Task.objects.create(user=self.user, title='inside', due_date=self.start)
+        Task.objects.create(user=self.user, title='after', due_date=self.end)
+        all_day = Task.objects.create(
+            user=self.user, title='all day', due_date=self.end - timedelta(hours=1), is_all_day=True
+        )
+        shared = Task.objects.create(user=self.other, title='shared', due_date=self.start + timedelta(days=1))
+        Task.objects.create(user=self.other, title='not shared', due_date=self.start)
+        TaskAccess.objects.create(user=self.user, task=shared, permission=TaskAccess.PERMISSION_VIEW)
+
+        self.assertEqual(list(self.in_window()), [inside, shared, all_day])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on PostgreSQL.')
+    def test_large_table_uses_the_due_date_index(self):
+        # On PostgreSQL an OR of the owner and shared-task conditions turns
+        # this into a scan of every task the user has, and finding shared
+        # tasks through the user's owner rows into a scan of all of those.
+        # benchmark_agenda times it at 100k tasks.
+        tasks = Task.objects.bulk_create(
+            Task(user=self.user, title=f'task {i}', due_date=self.start + timedelta(hours=i))
+            for i in range(-5000, 5000)
+        )
+        TaskAccess.objects.bulk_create(
+            TaskAccess(user=self.user, task=task, permission=TaskAccess.PERMISSION_OWNER) for task in tasks
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        plan = self.in_window().explain()
+        expected = index_names(Task, ('user_id', 'due_date'))
+        self.assertTrue(any(name in plan for name in expected), plan)
+        self.assertIn('taskaccess_user_shared_idx', plan)
+        self.assertEqual(self.in_window().count(), 7 * 24)
+
+
+class QueryBudgetTests(TestCase):
+    """Every endpoint in check_query_budgets runs its budgeted queries, whatever the data size."""
+
+    def assert_budgets(self, size):
+        user, ids = check_query_budgets.Command().seed(size)
+        for name, view, path, kwargs, budget in check_query_budgets.ENDPOINTS:
+            with self.subTest(name), check_query_budgets.private_cache():
+                with self.assertNumQueries(budget):
+                    response = check_query_budgets.request_endpoint(view, path, kwargs, user, ids)
+                self.assertEqual(response.status_code, 200)
+
+    def test_small_data(self):
+        self.assert_budgets(2)
+
+    def test_large_data(self):
+        self.assert_budgets(10)
+
+
+class TaskImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('importer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unreadable_file_reports_what_was_imported(self):
+        # Python's csv module refuses fields over 128 KiB.
+        content = 'title,priority\nFirst,high\nSecond,low\nThird,urgent\n' + 'x' * 200000 + ',low\nLast,low\n'
+        upload = SimpleUploadedFile('tasks.csv', content.encode(), content_type='text/csv')
+        response = self.client.post('/api/tasks/import/', {'file': upload})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Malformed CSV', response.data['detail'])
+        self.assertEqual(response.data['error']['line'], 5)
+        self.assertEqual((response.data['processed'], response.data['created'], response.data['failed']), (3, 2, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 4)
+        self.assertEqual(
+            sorted(Task.objects.filter(user=self.user).values_list('title', flat=True)), ['First', 'Second']
+        )
+
+
+@override_settings(CALENDAR_SYNC_PROVIDERS={'fake': 'core.calendar_sync.FakeCalendarProvider'})
+class CalendarSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('syncer')
+        self.account = CalendarSync.objects.create(
+            user=self.user, provider='fake', provider_user_id='calendar', access_token='token'
+        )
+        FakeCalendarProvider.calendars.clear()
+        self.calendar = FakeCalendarProvider.calendar('calendar')
+
+    def sync(self):
+        return sync_account(CalendarSync.objects.get(pk=self.account.pk))
+
+    def titles(self):
+        return sorted(Task.objects.filter(user=self.user).values_list('title', flat=True))
+
+    def counts(self, stats):
+        return stats['created'], stats['updated'], stats['deleted']
+
+    def test_incremental_sync_fetches_only_changes(self):
+        self.calendar.put('a', title='A')
+        self.calendar.put('b', title='B')
+        self.assertEqual(self.counts(self.sync()), (2, 0, 0))
+
+        self.calendar.put('a', title='A2')
+        self.calendar.delete('b')
+        self.calendar.put('c', title='C')
+        self.assertEqual(self.counts(self.sync()), (1, 1, 1))
+        self.assertEqual(self.titles(), ['A2', 'C'])
+        self.assertEqual(self.counts(self.sync()), (0, 0, 0))
+
+    def test_expired_token_resyncs_and_removes_unlisted_items(self):
+        self.calendar.put('a', title='A')
+        self.calendar.put('b', title='B')
+        self.sync()
+        # The provider dropped its change log: b is gone with no deletion to report.
+        with self.calendar.lock:
+            del self.calendar.changes['b']
+        CalendarSync.objects.filter(pk=self.account.pk).update(sync_token='999')
+
+        stats = self.sync()
+        self.assertIsNone(stats['error'])
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(self.titles(), ['A'])
+        self.assertEqual(CalendarSync.objects.get(pk=self.account.pk).sync_token, str(self.calendar.version))
+
+    @override_settings(CALENDAR_SYNC_MAX_RETRIES=3, CALENDAR_SYNC_BACKOFF=0.5)
+    def test_transient_failures_are_retried_with_backoff(self):
+        self.calendar.put('a', title='A')
+        self.calendar.fail(RetryableProviderError('busy'), RetryableProviderError('slow down', retry_after=5))
+        with patch('core.calendar_sync.time.sleep') as sleep, patch('core.calendar_sync.random.uniform', return_value=1):
+            stats = self.sync()
+        self.assertIsNone(stats['error'])
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 5])
+        self.assertEqual(self.titles(), ['A'])
+
+    @override_settings(CALENDAR_SYNC_MAX_RETRIES=1, CALENDAR_SYNC_BACKOFF=0)
+    def test_gives_up_after_max_retries(self):
+        self.calendar.put('a', title='A')
+        self.calendar.fail(RetryableProviderError('busy'), RetryableProviderError('busy'))
+        self.assertEqual(self.sync()['error'], 'busy')
+        account = CalendarSync.objects.get(pk=self.account.pk)
+        self.assertEqual((account.last_error, account.sync_token, account.locked_until), ('busy', '', None))
+        self.assertEqual(self.titles(), [])
+
+    def test_locked_account_is_skipped(self):
+        self.assertTrue(lock_account(self.account))
+        self.assertEqual(self.sync()['error'], 'Already syncing.')
+        CalendarSync.objects.filter(pk=self.account.pk).update(locked_until=None)
+        self.assertIsNone(self.sync()['error'])
+
+    def test_unregistered_provider_is_an_error(self):
+        with override_settings(CALENDAR_SYNC_PROVIDERS={}):
+            self.assertEqual(self.sync()['error'], 'Unknown calendar provider "fake".')
+
+
+class CategoryRenameTests(TestCase):
+    """A category rename reaches everyone who sees the task, not just its owner."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('category-owner')
+        self.member = User.objects.create_user('category-member')
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = SharedPlan.objects.create(owner=self.owner, name='Plan')
+            SharedPlanMember.objects.create(shared_plan=plan, user=self.member)
+            self.task = Task.objects.create(user=self.owner, title='shared')
+            SharedPlanTask.objects.create(shared_plan=plan, task=self.task)
+            self.category = Category.objects.create(user=self.owner, name='work')
+            TaskCategory.objects.create(task=self.task, category=self.category)
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_member_sees_the_rename(self):
+        list_etag = self.client.get('/api/tasks/')['ETag']
+        detail_etag = self.client.get(f'/api/tasks/{self.task.pk}/')['ETag']
+        token = self.client.get('/api/sync/').data['token']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'office'
+            self.category.save()
+
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['categories'][0]['name'], 'office')
+        response = self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        data = self.client.get('/api/sync/', {'since': token}).data
+        self.assertEqual(
+            [task['categories'][0]['name'] for task in data['tasks'] if task['id'] == self.task.pk], ['office']
+        )
+
+
+class TaskBulkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bulk-owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(user=self.user, title='existing')
+        self.doomed = Task.objects.create(user=self.user, title='doomed')
+        self.category = Category.objects.create(user=self.user, name='work')
+
+    def bulk(self, client, operations):
+        return client.post('/api/tasks/bulk/', operations, format='json')
+
+    def test_results_line_up_with_operations(self):
+        response = self.bulk(self.client, [
+            {'op': 'delete', 'id': self.doomed.pk},
+            {'op': 'create', 'data': {'title': 'new'}, 'categories': [self.category.pk]},
+            {'op': 'update', 'id': self.task.pk, 'data': {'title': 'renamed'}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([(result['op'], result['status']) for result in results],
+                         [('delete', 'deleted'), ('create', 'created'), ('update', 'updated')])
+        created = Task.objects.get(pk=results[1]['id'])
+        self.assertEqual([category['name'] for category in created.category_snapshot], ['work'])
+        self.assertEqual(Task.objects.get(pk=self.task.pk).title, 'renamed')
+        self.assertFalse(Task.objects.filter(pk=self.doomed.pk).exists())
+
+    def test_one_invalid_operation_writes_nothing(self):
+        response = self.bulk(self.client, [
+            {'op': 'create', 'data': {'title': 'new'}},
+            {'op': 'update', 'id': self.task.pk, 'data': {'priority': 'urgent'}},
+            {'op': 'delete', 'id': self.doomed.pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertEqual((errors[0], errors[2]), ({}, {}))
+        self.assertIn('priority', errors[1])
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).priority, self.task.priority)
+
+    def test_editor_only_replaces_their_own_category_links(self):
+        editor = User.objects.create_user('bulk-editor')
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = SharedPlan.objects.create(owner=self.user, name='Plan')
+            SharedPlanMember.objects.create(shared_plan=plan, user=editor, permission='edit')
+            SharedPlanTask.objects.create(shared_plan=plan, task=self.task)
+            TaskCategory.objects.create(task=self.task, category=self.category)
+        mine = Category.objects.create(user=editor, name='mine')
+        client = APIClient()
+        client.force_authenticate(editor)
+
+        response = self.bulk(client, [{'op': 'update', 'id': self.task.pk, 'categories': [mine.pk]}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(TaskCategory.objects.filter(task=self.task).values_list('category_id', flat=True)),
+            {self.category.pk, mine.pk}
+        )
+
+        # Unknown to the editor: the owner's category cannot be attached by them.
+        response = self.bulk(client, [{'op': 'update', 'id': self.task.pk, 'categories': [self.category.pk]}])
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on PostgreSQL.')
+class QueryPlanTests(TestCase):
+    """The main list querysets are served by their indexes at realistic table sizes."""
+
+    def test_list_querysets_use_their_indexes(self):
+        user = seed()
+        for name, plan, expected, ok in check_plans(user):
+            with self.subTest(name):
+                self.assertTrue(expected, f'{name}: the expected index does not exist.')
+                self.assertTrue(ok, f"{name} uses none of {', '.join(sorted(expected))}:\n{plan}")
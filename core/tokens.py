@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from .cache import is_shared_cache
+
+BLACKLIST_KEY = 'jwt-blacklist:{jti}'
+REVOKED = 'revoked'
+VALID = 'valid'
+
+
+def can_cache_valid_tokens():
+    """
+    "Not blacklisted" may only be cached in a cache every worker process
+    shares, otherwise a logout in one process would go unseen by the others.
+    Revocations are permanent, so they can be cached anywhere.
+    """
+    return settings.JWT_BLACKLIST_CACHE and is_shared_cache()
+
+
+class CachedRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist lookups are answered from the cache when
+    possible and fall back to the token_blacklist tables otherwise.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        cache = caches['default']
+        key = BLACKLIST_KEY.format(jti=jti)
+
+        state = cache.get(key)
+        if state == REVOKED:
+            raise TokenError(_('Token is blacklisted'))
+        if state == VALID:
+            return
+
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            cache.set(key, REVOKED, self._remaining_lifetime())
+            raise TokenError(_('Token is blacklisted'))
+
+        if can_cache_valid_tokens():
+            # add() rather than set() so a concurrent blacklist() always wins.
+            cache.add(key, VALID, self._remaining_lifetime())
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        token, _ = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                'token': str(self),
+                'expires_at': datetime_from_epoch(self.payload['exp']),
+            },
+        )
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token)], ignore_conflicts=True)
+        caches['default'].set(BLACKLIST_KEY.format(jti=jti), REVOKED, self._remaining_lifetime())
+        return token
+
+    def _remaining_lifetime(self):
+        remaining = datetime_from_epoch(self.payload['exp']) - aware_utcnow()
+        return max(int(remaining.total_seconds()), 1)
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 
 router = DefaultRouter()
 router.register(r'categories', views.CategoryViewSet, basename='category')
@@ -20,4 +21,19 @@ urlpatterns = [
     path('auth/register/', views.register_view, name='register'),
     path('auth/refresh/', views.refresh_token_view, name='refresh_token'),
     path('auth/user/', views.get_current_user, name='current_user'),
-] 
\ No newline at end of file
+    path('sync/', views.sync_view, name='sync'),
+    path('export/', views.export_view, name='export'),
+] 
+
+if settings.ASYNC_API_VIEWS:
+    # Native async handlers for the hot read paths; they must come first so
+    # they shadow the router and auth routes above.
+    urlpatterns = [
+        path('tasks/', async_views.task_list, name='async-task-list'),
+        path('tasks/<int:pk>/', async_views.task_detail, name='async-task-detail'),
+        path('streaks/', async_views.streak_list, name='async-streak-list'),
+        path('auth/user/', async_views.current_user, name='async-current-user'),
+        path('auth/login/', async_views.login_view, name='async-login'),
+        path('auth/logout/', async_views.logout_view, name='async-logout'),
+        path('auth/refresh/', async_views.refresh_token_view, name='async-refresh-token'),
+    ] + urlpatterns
@@ -1,25 +1,44 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
-from django.db.models import Q
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, Max, Subquery
 from django.contrib.auth import logout, get_user_model, authenticate
 from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from .models import (
     Category, Task, TaskCategory, Badge, UserBadge,
-    Streak, SharedPlan, SharedPlanMember, SharedPlanTask,
-    CalendarSync
+    Streak, StreakSummary, SharedPlan, SharedPlanMember, SharedPlanTask,
+    CalendarSync, TaskAccess
 )
 from .serializers import (
     CategorySerializer, TaskSerializer, TaskCategorySerializer,
-    BadgeSerializer, UserBadgeSerializer, StreakSerializer,
+    BadgeSerializer, UserBadgeSerializer, StreakSerializer, StreakSummarySerializer,
     SharedPlanSerializer, SharedPlanMemberSerializer,
     SharedPlanTaskSerializer, CalendarSyncSerializer,
-    UserSerializer, AuthTokenSerializer
+    UserSerializer, AuthTokenSerializer, TaskBulkOperationSerializer,
+    SyncTaskSerializer, SharedPlanMembershipSerializer,
+    subtree_watermark, get_requested_fields
 )
+from .badges import award_for_change
+from .bulk import apply_task_operations, BulkOperationError
+from .importers import detect_format, import_tasks, read_records
+from .streaming import iter_chunks, stream_json_array
+from .export import NDJSONRenderer, stream_export
+from .filters import TaskFilter, TaskOrderingFilter, get_request_timezone, parse_datetime_param
+from .cache import CachedResponseMixin
+from .routers import ReplicaReadMixin
+from .tokens import CachedRefreshToken
+from .conditional import ConditionalRequestMixin, conditional_response, make_etag
+from .sync import collect_changes, make_sync_token, read_sync_token, is_token_expired
+from .pagination import TaskPagination, StreakPagination
 from django.views.decorators.csrf import ensure_csrf_cookie
 from datetime import datetime, timedelta
 
@@ -54,11 +73,66 @@ def unset_auth_cookies(response):
     response.delete_cookie('access_token')
     response.delete_cookie('refresh_token')
 
+AGENDA_MAX_WINDOW = timedelta(days=366)
+AGENDA_CHUNK_SIZE = 500
+# Tombstone kind -> the section of the sync payload holding that kind of row.
+SYNC_SECTIONS = {'task': 'tasks', 'category': 'categories', 'membership': 'memberships', 'streak': 'streaks'}
+
+class SparseFieldsetViewMixin:
+    """
+    Load what the requested fields need and nothing more: the serializer's
+    eager loading plan (see EagerLoadingMixin) for those fields, and only the
+    columns backing the fields requested with ``?fields=``.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        requested = get_requested_fields(self.request)
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset, requested)
+        if requested is None:
+            return queryset
+
+        model = queryset.model
+        serializer_fields = serializer_class().fields
+        columns = {model._meta.pk.name}
+        # The paginator reads its ordering keys off every page boundary row.
+        ordering = ()
+        if hasattr(self.paginator, 'get_ordering'):
+            ordering = self.paginator.get_ordering(self.request, queryset, self)
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        concrete = {field.name for field in model._meta.concrete_fields}
+        columns.update(order.lstrip('-') for order in ordering if order.lstrip('-') in concrete)
+
+        needs_relations = False
+        for name in requested:
+            field = serializer_fields.get(name)
+            if field is None or field.source == '*':
+                needs_relations = True
+                continue
+            try:
+                model_field = model._meta.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                needs_relations = True
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(model_field.name)
+            else:
+                needs_relations = True
+
+        queryset = queryset.only(*columns)
+        if not needs_relations:
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
 # Create your views here.
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (Category,)
 
     def get_queryset(self):
         return Category.objects.filter(user=self.request.user)
@@ -66,35 +140,119 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ReplicaReadMixin, ConditionalRequestMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskPagination
+    filter_backends = [TaskFilter, TaskOrderingFilter]
 
     def get_queryset(self):
-        return Task.objects.filter(
-            Q(user=self.request.user) |
-            Q(sharedplantask__shared_plan__members=self.request.user)
-        ).distinct()
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = Task.objects.visible_to(self.request.user)
+        else:
+            queryset = Task.objects.editable_by(self.request.user)
+        return queryset
+
+    def get_list_etag(self, request):
+        access = TaskAccess.objects.filter(user=request.user).aggregate(
+            count=Count('pk'),
+            granted=Max('updated_at'),
+            updated=Max('task__updated_at')
+        )
+        return make_etag(
+            request.get_full_path(), access['count'], access['granted'], access['updated'],
+            self._category_watermark(request.user)
+        )
+
+    def get_object_etag(self, request, pk):
+        try:
+            row = self.get_queryset().filter(pk=pk).annotate(
+                categories_updated=Subquery(
+                    Category.objects.filter(user=request.user).order_by('-updated_at').values('updated_at')[:1]
+                )
+            ).values_list('updated_at', 'categories_updated').first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if row is None:
+            return None
+        updated_at, categories_updated = row
+        count, latest = subtree_watermark(pk)
+        return make_etag(request.get_full_path(), pk, updated_at, count, latest, categories_updated)
+
+    def _category_watermark(self, user):
+        # Category renames and recolours show up inside every task payload.
+        return Category.objects.filter(user=user).aggregate(updated=Max('updated_at'))['updated']
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        operations = TaskBulkOperationSerializer(data=request.data, many=True)
+        operations.is_valid(raise_exception=True)
+        try:
+            results = apply_task_operations(request.user, operations.validated_data)
+        except BulkOperationError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload a CSV or ICS file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = detect_format(upload.name, upload.content_type or '')
+        if file_format is None:
+            return Response({'detail': 'Only .csv and .ics files can be imported.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        records = read_records(upload, file_format, get_request_timezone(request))
+        report = import_tasks(request.user, records)
+        if report['error'] is not None:
+            # Rows before the unreadable part were imported; the report says how many.
+            return Response({'detail': report['error']['detail'], **report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+    @action(detail=False, methods=['get'])
+    def agenda(self, request):
+        tz = get_request_timezone(request)
+        start = parse_datetime_param(request.query_params.get('start'), tz)
+        end = parse_datetime_param(request.query_params.get('end'), tz)
+        if start is None or end is None:
+            return Response(
+                {'detail': 'Provide start and end as ISO 8601 dates or datetimes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not start < end <= start + AGENDA_MAX_WINDOW:
+            return Response(
+                {'detail': f'end must be after start and at most {AGENDA_MAX_WINDOW.days} days later.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(
+            Task.objects.in_window(request.user, start, end, tz)
+        ).order_by('due_date', 'id')
+        chunks = (
+            self.get_serializer(chunk, many=True).data
+            for chunk in iter_chunks(queryset, AGENDA_CHUNK_SIZE)
+        )
+        return StreamingHttpResponse(stream_json_array(chunks), content_type='application/json')
+
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         task = self.get_object()
-        task.status = 'completed'
-        task.save()
 
-        # Update streak
-        today = timezone.now().date()
-        streak, created = Streak.objects.get_or_create(
-            user=request.user,
-            date=today,
-            defaults={'tasks_completed': 0, 'is_completed_day': False}
-        )
-        streak.tasks_completed += 1
-        streak.is_completed_day = True
-        streak.save()
+        with transaction.atomic():
+            # Only the request that flips the status counts towards the streak,
+            # so completing an already completed task is a no-op.
+            completed = Task.objects.filter(pk=task.pk).exclude(status='completed').update(
+                status='completed',
+                updated_at=timezone.now()
+            )
+            if completed:
+                today = timezone.now().date()
+                Streak.objects.record_completion(request.user, today)
+                before, summary = StreakSummary.objects.record_completion(request.user, today)
+                award_for_change(request.user, before, summary.metrics())
 
         return Response({'status': 'task completed'})
 
@@ -105,41 +263,74 @@ class TaskViewSet(viewsets.ModelViewSet):
         task.save()
         return Response({'status': 'task snoozed'})
 
-class TaskCategoryViewSet(viewsets.ModelViewSet):
+class TaskCategoryViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = TaskCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return TaskCategory.objects.filter(task__user=self.request.user)
 
-class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
+class BadgeViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    replica_actions = ('list', 'retrieve')
     serializer_class = BadgeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (Badge,)
     queryset = Badge.objects.all()
 
-class UserBadgeViewSet(viewsets.ReadOnlyModelViewSet):
+class UserBadgeViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    replica_actions = ('list', 'retrieve')
     serializer_class = UserBadgeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (UserBadge, Badge)
 
     def get_queryset(self):
         return UserBadge.objects.filter(user=self.request.user)
 
-class StreakViewSet(viewsets.ReadOnlyModelViewSet):
+class StreakViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    replica_actions = ('list', 'retrieve', 'summary')
     serializer_class = StreakSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (Streak,)
+    pagination_class = StreakPagination
 
     def get_queryset(self):
         return Streak.objects.filter(user=self.request.user)
 
-class SharedPlanViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        summary = StreakSummary.objects.filter(user=request.user).first() or StreakSummary(user=request.user)
+        return Response(StreakSummarySerializer(summary).data)
+
+class SharedPlanViewSet(ReplicaReadMixin, ConditionalRequestMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = SharedPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return SharedPlan.objects.filter(
-            Q(owner=self.request.user) |
-            Q(members=self.request.user)
-        ).distinct()
+        return SharedPlan.objects.visible_to(self.request.user)
+
+    def get_list_etag(self, request):
+        plans = SharedPlan.objects.visible_to(request.user)
+        return self._plans_etag(request, plans)
+
+    def get_object_etag(self, request, pk):
+        try:
+            plans = SharedPlan.objects.visible_to(request.user).filter(pk=pk)
+            return self._plans_etag(request, plans)
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def _plans_etag(self, request, plans):
+        plan_watermark = plans.aggregate(count=Count('pk'), updated=Max('updated_at'))
+        if not plan_watermark['count'] and self.detail:
+            return None
+        member_watermark = SharedPlanMember.objects.filter(shared_plan__in=plans.values('pk')).aggregate(
+            count=Count('pk'),
+            updated=Max('updated_at')
+        )
+        return make_etag(
+            request.get_full_path(), plan_watermark['count'], plan_watermark['updated'],
+            member_watermark['count'], member_watermark['updated']
+        )
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -169,7 +360,7 @@ class SharedPlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class SharedPlanTaskViewSet(viewsets.ModelViewSet):
+class SharedPlanTaskViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = SharedPlanTaskSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -178,7 +369,7 @@ class SharedPlanTaskViewSet(viewsets.ModelViewSet):
             shared_plan__members=self.request.user
         )
 
-class CalendarSyncViewSet(viewsets.ModelViewSet):
+class CalendarSyncViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = CalendarSyncSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -201,6 +392,7 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    # PasswordHashingBusy is a Throttled error, answered with a 429.
     user = authenticate(username=username, password=password)
     
     if user is None:
@@ -209,7 +401,7 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    refresh = RefreshToken.for_user(user)
+    refresh = CachedRefreshToken.for_user(user)
     response = Response({
         'detail': 'Successfully logged in.',
         'user': {
@@ -265,7 +457,7 @@ def logout_view(request):
     refresh_token = request.COOKIES.get('refresh_token')
     if refresh_token:
         try:
-            token = RefreshToken(refresh_token)
+            token = CachedRefreshToken(refresh_token)
             token.blacklist()
             response = Response({'detail': 'Successfully logged out.'})
             unset_auth_cookies(response)
@@ -318,7 +510,7 @@ def register_view(request):
         last_name=last_name or ''
     )
     
-    refresh = RefreshToken.for_user(user)
+    refresh = CachedRefreshToken.for_user(user)
     response = Response({
         'detail': 'Successfully registered.',
         'user': {
@@ -367,7 +559,7 @@ def refresh_token_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        token = RefreshToken(refresh_token)
+        token = CachedRefreshToken(refresh_token)
         response = Response({'detail': 'Token refreshed successfully.'})
         
         # Set cookies with proper configuration
@@ -405,7 +597,7 @@ def refresh_token_view(request):
 def get_current_user(request):
     """Get the current authenticated user's information"""
     user = request.user
-    return Response({
+    data = {
         'id': user.id,
         'username': user.username,
         'email': user.email,
@@ -413,4 +605,59 @@ def get_current_user(request):
         'last_name': user.last_name,
         'date_joined': user.date_joined,
         'last_login': user.last_login
+    }
+    return conditional_response(request, make_etag(*data.values()), lambda request: Response(data))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_view(request):
+    """Return what changed for the current user since the ``since`` token"""
+    since = None
+    token = request.query_params.get('since')
+    if token:
+        try:
+            since = read_sync_token(token)
+        except signing.BadSignature:
+            return Response(
+                {'detail': 'Invalid sync token.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if is_token_expired(since):
+            since = None
+
+    # Take the watermark before reading so nothing committed meanwhile is skipped.
+    watermark = timezone.now()
+    changes = collect_changes(request.user, since)
+    data = {
+        'tasks': SyncTaskSerializer(changes['tasks'], many=True).data,
+        'categories': CategorySerializer(changes['categories'], many=True).data,
+        'memberships': SharedPlanMembershipSerializer(changes['memberships'], many=True).data,
+        'streaks': StreakSerializer(changes['streaks'], many=True).data,
+    }
+    # A row that was removed and is visible again (e.g. access revoked and
+    # re-granted) is sent as changed only.
+    deleted = {}
+    for kind, ids in changes['deleted'].items():
+        present = {item['id'] for item in data.get(SYNC_SECTIONS.get(kind), ())}
+        remaining = [object_id for object_id in ids if object_id not in present]
+        if remaining:
+            deleted[kind] = remaining
+    return Response({
+        'token': make_sync_token(watermark),
+        'full': since is None,
+        **data,
+        'deleted': deleted,
     })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, NDJSONRenderer])
+def export_view(request):
+    """Stream all of the current user's data, as JSON or as NDJSON with ``?format=ndjson``"""
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(
+        stream_export(request.user.pk, renderer.format),
+        content_type=f'{renderer.media_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="planify-export.{renderer.format}"'
+    return response
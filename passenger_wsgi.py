@@ -4,4 +4,10 @@ import sys
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-from planify.wsgi import application
\ No newline at end of file
+from planify.wsgi import application
+from django.db import connections
+
+# With smart spawning Passenger forks its workers from this preloaded process.
+# A persistent connection opened while loading would be shared by every child
+# (and torn down under them when one closes it), so none may survive the import.
+connections.close_all()
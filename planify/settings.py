@@ -58,6 +58,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.PrimaryPinningMiddleware',
+    'core.hashers.PasswordHashingBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'planify.urls'
@@ -80,6 +82,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'planify.wsgi.application'
 
+# Serve the hot read endpoints and the auth views with the native async views
+# in core/async_views.py. Turn on when running under ASGI (planify/asgi.py)
+ASYNC_API_VIEWS = os.getenv('ASYNC_API_VIEWS', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -92,9 +98,67 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD', 'postgres'),
         'HOST': os.getenv('DATABASE_HOST', 'localhost'),
         'PORT': os.getenv('DATABASE_PORT', '5432'),
+        # Keep each worker's connection open between requests instead of
+        # reconnecting every time; None keeps it for the life of the process.
+        # Set to 0 under ASGI, where connections are not reused across requests,
+        # and put a pooler such as PgBouncer in front instead.
+        # Django 5.0 with psycopg2 has no connection pool of its own (OPTIONS
+        # 'pool' needs Django 5.1 and psycopg 3), so these persistent
+        # connections are the pool: one per worker thread, i.e. up to
+        # PassengerMaxPoolSize x threads per process, each closed once it is
+        # CONN_MAX_AGE seconds old. Keep that product (times the number of app
+        # servers) under the server's max_connections. Measure the difference
+        # with ``manage.py benchmark_db_connections``.
+        'CONN_MAX_AGE': (
+            None if os.getenv('DATABASE_CONN_MAX_AGE') == 'None'
+            else int(os.getenv('DATABASE_CONN_MAX_AGE', '60'))
+        ),
+        # Ping a reused connection before the first query of a request so a
+        # connection dropped by the server or a pooler is replaced transparently.
+        'CONN_HEALTH_CHECKS': os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # Transaction-mode poolers (PgBouncer pool_mode=transaction) cannot keep
+        # server-side cursors open across statements.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DATABASE_POOLER', 'False') == 'True',
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DATABASE_CONNECT_TIMEOUT', '5')),
+        },
+    }
+}
+
+# Read replicas, as a comma-separated list of host[:port]. Each one becomes a
+# DATABASES alias that list endpoints and read-only viewsets read from; see
+# core.routers. After a write the user reads from the primary for
+# REPLICA_PIN_SECONDS so they always see their own changes. Pins are kept in
+# the default cache, so replicas need a shared cache backend (check core.E001).
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(','))):
+    replica_host, _, replica_port = replica.strip().partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# Any Django cache backend works, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# with CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# Seconds a cached API response may be served before it is rebuilt
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', '300'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -114,6 +178,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# At most PASSWORD_HASH_CONCURRENCY password hashes run at once across every
+# worker process (core.hashers), so a burst of logins cannot take every CPU
+# from the rest of the API. Up to PASSWORD_HASH_QUEUE_SIZE more wait for a
+# slot for PASSWORD_HASH_QUEUE_TIMEOUT seconds; sign-ins beyond that are
+# answered with 429. The counts live in the default cache; with a per-process
+# cache each worker is limited separately (check core.W001).
+PASSWORD_HASHERS = [
+    'core.hashers.BoundedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', os.cpu_count() or 2))
+# Seconds of idle hashing after which slots held by killed workers are released
+PASSWORD_HASH_SLOT_TIMEOUT = int(os.getenv('PASSWORD_HASH_SLOT_TIMEOUT', '60'))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', '16'))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '2'))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', '1'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -170,6 +254,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
 }
 
 # JWT Settings
@@ -194,3 +279,33 @@ SIMPLE_JWT = {
     'AUTH_COOKIE_PATH': '/',
     'AUTH_COOKIE_SAMESITE': 'Lax',
 }
+
+# Build request.user from the access token's claims and only load the User row
+# when a view reads a non-id attribute
+JWT_LAZY_USER = os.getenv('JWT_LAZY_USER', 'True') == 'True'
+
+# Lazy users are still checked to exist and be active on every request, from a
+# status flag in the default cache. Saving or deleting the user clears it
+# (in every process only with a shared cache); updates that skip signals, such
+# as queryset.update(), take effect within this many seconds. 0 checks the
+# database on every request.
+JWT_USER_STATUS_TTL = int(os.getenv('JWT_USER_STATUS_TTL', '60'))
+
+# In-process cache of loaded User rows; a TTL of 0 disables it
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', '0'))
+JWT_USER_CACHE_SIZE = int(os.getenv('JWT_USER_CACHE_SIZE', '1024'))
+
+# Answer refresh-token blacklist lookups from the cache. "Not blacklisted" is
+# only cached when the cache backend is shared between processes (e.g. Redis)
+JWT_BLACKLIST_CACHE = os.getenv('JWT_BLACKLIST_CACHE', 'True') == 'True'
+
+# Calendar sync (core.calendar_sync): provider name -> provider class. Syncs
+# run on at most CALENDAR_SYNC_CONCURRENCY threads, which also bounds the
+# database connections they hold; each provider's API calls are rate limited
+# to the class's rate_limit per second in each process. No provider is
+# registered by default; the tests register core.calendar_sync.FakeCalendarProvider
+CALENDAR_SYNC_PROVIDERS = {}
+CALENDAR_SYNC_CONCURRENCY = int(os.getenv('CALENDAR_SYNC_CONCURRENCY', '4'))
+CALENDAR_SYNC_INTERVAL = timedelta(seconds=int(os.getenv('CALENDAR_SYNC_INTERVAL', '900')))
+CALENDAR_SYNC_MAX_RETRIES = int(os.getenv('CALENDAR_SYNC_MAX_RETRIES', '3'))
+CALENDAR_SYNC_BACKOFF = float(os.getenv('CALENDAR_SYNC_BACKOFF', '1.0'))